@@ -10,12 +10,14 @@ import sys
 from pathlib import Path
 import json
 import os
+import time
+import torch
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 
 from retrieval.vector_store import ChromaVectorStore
-from retrieval.embedder import SentenceTransformerEmbedder
+from retrieval.embedder import get_embedder
 from generation.llm import RAGGenerator
 
 # Page configuration
@@ -56,14 +58,59 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_resource
+@st.cache_resource(show_spinner=False)
+def _get_embedder():
+    """Load and cache the embedder."""
+    # DEVICE overrides auto-detection (CUDA if available, otherwise CPU)
+    return get_embedder(device=os.getenv("DEVICE") or None)
+
+@st.cache_resource(show_spinner=False)
+def _get_vector_store():
+    """Load and cache the vector store."""
+    return ChromaVectorStore()
+
+# Generation models: on GPU an instruction-tuned model loaded in 4-bit NF4; on
+# CPU, where bitsandbytes cannot quantize, the much smaller DialoGPT-small
+GPU_GENERATOR_MODEL = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
+CPU_GENERATOR_MODEL = "microsoft/DialoGPT-small"
+
+def _generator_device() -> str:
+    """Device for the generator: DEVICE if set, otherwise CUDA if available."""
+    return os.getenv("DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+
+@st.cache_resource(show_spinner=False)
+def _get_generator():
+    """Load and cache the generator."""
+    device = _generator_device()
+    if device == "cuda":
+        # Weights are loaded in 4-bit NF4 on GPU to cut memory traffic per token
+        return RAGGenerator(model_name=GPU_GENERATOR_MODEL, device=device, quantize="nf4")
+    return RAGGenerator(model_name=CPU_GENERATOR_MODEL, device=device, quantize=None)
+
+@st.cache_data(ttl=3600, max_entries=1024, show_spinner=False)
+def _retrieve(query: str, n_results: int, ef_search: int, _vector_store, _embedder) -> tuple:
+    """
+    Retrieve context chunks for a query, cached across reruns.
+    
+    Underscore-prefixed arguments are not hashed by Streamlit, so the cache
+    is keyed on (query, n_results, ef_search) only.
+    
+    Returns:
+        Tuple of (context chunks, latency in ms of the uncached query).
+        Cache hits return the latency measured when the entry was computed.
+    """
+    _vector_store.set_search_ef(ef_search)
+    start_time = time.perf_counter()
+    results = _vector_store.query(query, n_results=n_results, embedder=_embedder)
+    return results, (time.perf_counter() - start_time) * 1000
+
 def load_components():
-    """Load and cache the RAG components."""
+    """Load the RAG components, each cached independently across reruns."""
     try:
         with st.spinner("Loading models and vector store..."):
-            embedder = SentenceTransformerEmbedder()
-            vector_store = ChromaVectorStore()
-            generator = RAGGenerator(model_name="microsoft/DialoGPT-small")
+            embedder = _get_embedder()
+            vector_store = _get_vector_store()
+            generator = _get_generator()
         return embedder, vector_store, generator
     except Exception as e:
         st.error(f"Error loading components: {str(e)}")
@@ -97,6 +144,11 @@ def main():
         
         st.header("🔧 Settings")
         num_results = st.slider("Number of sources to retrieve", 1, 10, 3)
+        ef_search = st.slider(
+            "Search ef",
+            16, 256, 64,
+            help="HNSW search beam width: higher values improve recall at the cost of latency"
+        )
         
         st.header("💡 Example Queries")
         example_queries = [
@@ -129,11 +181,8 @@ def main():
                 with st.spinner("Processing your question..."):
                     try:
                         # Retrieve relevant context
-                        context_chunks = vector_store.query(
-                            query, 
-                            n_results=num_results, 
-                            embedder=embedder
-                        )
+                        context_chunks, retrieval_ms = _retrieve(query, num_results, ef_search, vector_store, embedder)
+                        st.metric("Retrieval latency", f"{retrieval_ms:.0f} ms")
                         
                         if not context_chunks:
                             st.warning("No relevant documents found for your query.")
@@ -148,6 +197,8 @@ def main():
                         
                         # Display sources
                         st.header("📚 Sources")
+                        # ChromaDB's "ip" distance is 1 - dot product, so on
+                        # normalized embeddings 1 - distance is the raw score
                         for i, chunk in enumerate(context_chunks, 1):
                             with st.expander(f"Source {i}: {chunk['metadata']['source_paper_id']}"):
                                 st.markdown(f"""
@@ -156,7 +207,8 @@ def main():
                                 **Type:** {chunk['metadata']['content_type']}  
                                 **Relevance:** {1 - chunk['distance']:.2f}
                                 """)
-                                st.markdown(f"**Content:** {chunk['text_content'][:500]}...")
+                                preview = chunk['metadata'].get('preview') or chunk['text_content'][:500]
+                                st.markdown(f"**Content:** {preview}...")
                         
                     except Exception as e:
                         st.error(f"Error processing query: {str(e)}")
@@ -187,7 +239,7 @@ def main():
         This Scientific RAG system uses:
         - **Embeddings:** BGE-large-en-v1.5
         - **Vector Store:** ChromaDB
-        - **Generation:** DialoGPT
+        - **Generation:** TinyLlama-1.1B-Chat (GPU) or DialoGPT-small (CPU)
         - **Data:** arXiv q-bio papers
         """)
 
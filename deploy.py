@@ -7,6 +7,7 @@ This script helps users deploy and set up the Scientific RAG System.
 
 import os
 import sys
+import shutil
 import subprocess
 from pathlib import Path
 
@@ -50,7 +51,15 @@ def create_directories():
 def install_dependencies():
     """Install Python dependencies."""
     print("📦 Installing dependencies...")
-    if not run_command("pip install -r requirements.txt", "Installing Python packages"):
+    if shutil.which("uv"):
+        # uv resolves and downloads in parallel; target the running interpreter
+        command = f'uv pip install --python "{sys.executable}" -r requirements.txt'
+        if os.getenv("CI") and sys.prefix == sys.base_prefix:
+            command += " --system"
+    else:
+        command = f'"{sys.executable}" -m pip install -r requirements.txt'
+    
+    if not run_command(command, "Installing Python packages"):
         return False
     return True
 
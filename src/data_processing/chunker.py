@@ -5,30 +5,236 @@ This module implements structural element chunking for scientific papers,
 creating meaningful chunks from parsed paper data.
 """
 
-import json
 import logging
+import os
+import sys
+import numpy as np
+import orjson
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple
 from tqdm import tqdm
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Sidecar file recording which parsed papers have already been chunked
+MANIFEST_FILENAME = ".chunk_manifest.json"
+
+# Length of the text preview stored with each chunk for display
+PREVIEW_LENGTH = 500
+
+# Papers submitted to the worker pool per worker ahead of the consumer
+SUBMIT_WINDOW_PER_WORKER = 4
+
+# Lowercased content types; there are only a handful of distinct values
+_LOWER_CACHE: Dict[str, str] = {}
+
+def _lower(value: str) -> str:
+    """Return value.lower(), reusing the string from earlier calls."""
+    lowered = _LOWER_CACHE.get(value)
+    if lowered is None:
+        lowered = _LOWER_CACHE[value] = value.lower()
+    return lowered
+
+def _count_values(values: Iterable[str], count: int) -> Dict[str, int]:
+    """
+    Count occurrences of each value.
+    
+    Values are mapped to small integer ids and counted with np.bincount.
+    
+    Args:
+        values: Values to count
+        count: Number of values
+        
+    Returns:
+        Dictionary mapping each value to its count, in first-seen order
+    """
+    value_to_id: Dict[str, int] = {}
+    ids = np.fromiter(
+        (value_to_id.setdefault(value, len(value_to_id)) for value in values),
+        dtype=np.int32,
+        count=count
+    )
+    counts = np.bincount(ids, minlength=len(value_to_id))
+    return {value: int(counts[idx]) for value, idx in value_to_id.items()}
+
+def _map_bounded(executor: Executor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    """
+    Like executor.map, but with at most window items submitted at a time.
+    
+    Items are read from the iterable lazily and results are yielded in
+    input order, so memory stays bounded even for a large input file.
+    
+    Args:
+        executor: Executor to run fn in
+        fn: Function applied to each item
+        items: Iterable of items
+        window: Maximum number of submitted but not yet yielded items
+        
+    Yields:
+        fn(item) for each item, in order
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+@dataclass
+class Chunk:
+    """A single chunk of paper text with its metadata."""
+    
+    # Explicit slots keep per-chunk memory small without requiring
+    # dataclass(slots=True), which is only available from Python 3.10
+    __slots__ = ("text_content", "source_paper_id", "section_header", "content_type", "chunk_id", "extra")
+    
+    text_content: str
+    source_paper_id: str
+    section_header: str
+    content_type: str
+    chunk_id: str
+    extra: Dict[str, Any]
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata dictionary as stored alongside the chunk text."""
+        return {
+            "source_paper_id": self.source_paper_id,
+            "section_header": self.section_header,
+            "content_type": self.content_type,
+            "chunk_id": self.chunk_id,
+            "preview": self.text_content[:PREVIEW_LENGTH],
+            **self.extra
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the serialized {"text_content", "metadata"} form."""
+        return {"text_content": self.text_content, "metadata": self.metadata}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Chunk":
+        """Create a chunk from its serialized form."""
+        metadata = dict(data["metadata"])
+        return cls(
+            text_content=data["text_content"],
+            source_paper_id=metadata.pop("source_paper_id"),
+            section_header=metadata.pop("section_header"),
+            content_type=metadata.pop("content_type"),
+            chunk_id=metadata.pop("chunk_id", ""),
+            extra={k: v for k, v in metadata.items() if k != "preview"}
+        )
+
+@dataclass
+class ChunkBatch:
+    """
+    A batch of chunks stored column by column.
+    
+    Each field holds one entry per chunk, so indexing code reads whole
+    columns instead of looking up the same attributes chunk by chunk.
+    """
+    
+    __slots__ = ("texts", "source_paper_ids", "section_headers", "content_types", "chunk_ids", "extras")
+    
+    texts: List[str]
+    source_paper_ids: List[str]
+    section_headers: List[str]
+    content_types: List[str]
+    chunk_ids: List[str]
+    extras: List[Dict[str, Any]]
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    @classmethod
+    def from_chunks(cls, chunks: List[Chunk]) -> "ChunkBatch":
+        """Transpose a list of chunks into columns."""
+        if not chunks:
+            return cls([], [], [], [], [], [])
+        columns = zip(*(
+            (chunk.text_content, chunk.source_paper_id, chunk.section_header,
+             chunk.content_type, chunk.chunk_id, chunk.extra)
+            for chunk in chunks
+        ))
+        return cls(*map(list, columns))
+    
+    def metadatas(self) -> List[Dict[str, Any]]:
+        """Metadata dictionaries as stored alongside the chunk texts, in order."""
+        return [
+            {
+                "source_paper_id": paper_id,
+                "section_header": section,
+                "content_type": content_type,
+                "chunk_id": chunk_id,
+                "preview": text[:PREVIEW_LENGTH],
+                **extra
+            }
+            for text, paper_id, section, content_type, chunk_id, extra in zip(
+                self.texts, self.source_paper_ids, self.section_headers,
+                self.content_types, self.chunk_ids, self.extras
+            )
+        ]
+
+def _chunk_file(json_file: Path) -> Optional[List[Chunk]]:
+    """
+    Load and chunk a single parsed paper.
+    
+    Defined at module level so it can be pickled for worker processes.
+    
+    Args:
+        json_file: Path to the parsed JSON file
+        
+    Returns:
+        List of chunks, or None if the paper could not be chunked
+    """
+    try:
+        paper_data = orjson.loads(json_file.read_bytes())
+        
+        return ScientificChunker.chunk_parsed_paper(paper_data)
+        
+    except Exception as e:
+        logger.error("Error chunking %s: %s", json_file, e)
+        return None
+
+def _chunk_line(line: bytes) -> Optional[List[Chunk]]:
+    """
+    Chunk a single parsed paper from a line of a JSON Lines shard.
+    
+    Args:
+        line: JSON document of one parsed paper
+        
+    Returns:
+        List of chunks, or None if the paper could not be chunked
+    """
+    try:
+        return ScientificChunker.chunk_parsed_paper(orjson.loads(line))
+        
+    except Exception as e:
+        logger.error("Error chunking shard line: %s", e)
+        return None
+
 class ScientificChunker:
     """Chunks scientific papers into meaningful segments."""
     
-    def __init__(self, output_dir: str = "data/chunks"):
+    def __init__(self, output_dir: str = "data/chunks", max_workers: Optional[int] = None):
         """
         Initialize the chunker.
         
         Args:
             output_dir: Directory to save chunked data
+            max_workers: Number of worker processes for chunking (None for one per CPU)
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers or os.cpu_count()
         
-    def chunk_parsed_paper(self, json_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def chunk_parsed_paper(json_data: Dict[str, Any]) -> List[Chunk]:
         """
         Chunk a parsed paper into meaningful segments.
         
@@ -36,40 +242,37 @@ class ScientificChunker:
             json_data: Structured paper data from parser
             
         Returns:
-            List of chunks with text content and metadata
+            List of chunks
         """
         chunks = []
         paper_id = json_data.get("paper_id", "unknown")
         
         # Chunk 1: Abstract
         if json_data.get("abstract"):
-            abstract_chunk = {
-                "text_content": json_data["abstract"],
-                "metadata": {
-                    "source_paper_id": paper_id,
-                    "section_header": "Abstract",
-                    "content_type": "abstract",
-                    "chunk_id": f"{paper_id}_abstract"
-                }
-            }
-            chunks.append(abstract_chunk)
+            chunks.append(Chunk(
+                text_content=json_data["abstract"],
+                source_paper_id=paper_id,
+                section_header="Abstract",
+                content_type="abstract",
+                chunk_id=f"{paper_id}_abstract",
+                extra={}
+            ))
         
         # Chunk 2: Title
         if json_data.get("title"):
-            title_chunk = {
-                "text_content": json_data["title"],
-                "metadata": {
-                    "source_paper_id": paper_id,
-                    "section_header": "Title",
-                    "content_type": "title",
-                    "chunk_id": f"{paper_id}_title"
-                }
-            }
-            chunks.append(title_chunk)
+            chunks.append(Chunk(
+                text_content=json_data["title"],
+                source_paper_id=paper_id,
+                section_header="Title",
+                content_type="title",
+                chunk_id=f"{paper_id}_title",
+                extra={}
+            ))
         
         # Chunk 3: Section content
         for section_idx, section in enumerate(json_data.get("sections", [])):
-            section_header = section.get("header", f"Section_{section_idx}")
+            # Headers repeat across every element of a section, so share one string
+            section_header = sys.intern(section.get("header", f"Section_{section_idx}"))
             section_content = section.get("content", [])
             
             # Process each content element in the section
@@ -77,97 +280,283 @@ class ScientificChunker:
                 content_type = content_item.get("type", "Unknown")
                 text = content_item.get("text", "")
                 
-                if not text.strip():
+                if not text or text.isspace():
                     continue
                 
                 # Create chunk for this content element
-                chunk = {
-                    "text_content": text,
-                    "metadata": {
-                        "source_paper_id": paper_id,
-                        "section_header": section_header,
-                        "content_type": content_type.lower(),
-                        "chunk_id": f"{paper_id}_{section_idx}_{content_idx}",
-                        "original_metadata": content_item.get("metadata", {})
-                    }
-                }
-                chunks.append(chunk)
+                chunks.append(Chunk(
+                    text_content=text,
+                    source_paper_id=paper_id,
+                    section_header=section_header,
+                    content_type=_lower(content_type),
+                    chunk_id=f"{paper_id}_{section_idx}_{content_idx}",
+                    extra={"original_metadata": content_item.get("metadata", {})}
+                ))
         
         # Chunk 4: Tables
         for table_idx, table in enumerate(json_data.get("tables", [])):
             table_content = table.get("content", "")
             table_section = table.get("section", "Unknown")
             
-            if table_content.strip():
-                table_chunk = {
-                    "text_content": table_content,
-                    "metadata": {
-                        "source_paper_id": paper_id,
-                        "section_header": table_section,
-                        "content_type": "table",
-                        "chunk_id": f"{paper_id}_table_{table_idx}",
-                        "table_metadata": table.get("metadata", {})
-                    }
-                }
-                chunks.append(table_chunk)
+            if table_content and not table_content.isspace():
+                chunks.append(Chunk(
+                    text_content=table_content,
+                    source_paper_id=paper_id,
+                    section_header=table_section,
+                    content_type="table",
+                    chunk_id=f"{paper_id}_table_{table_idx}",
+                    extra={"table_metadata": table.get("metadata", {})}
+                ))
         
         # Chunk 5: Equations
         for eq_idx, equation in enumerate(json_data.get("equations", [])):
             eq_text = equation.get("text", "")
             eq_section = equation.get("section", "Unknown")
             
-            if eq_text.strip():
-                equation_chunk = {
-                    "text_content": eq_text,
-                    "metadata": {
-                        "source_paper_id": paper_id,
-                        "section_header": eq_section,
-                        "content_type": "equation",
-                        "chunk_id": f"{paper_id}_equation_{eq_idx}",
-                        "needs_vision_processing": equation.get("needs_vision_processing", False)
-                    }
-                }
-                chunks.append(equation_chunk)
-        
-        logger.info(f"Created {len(chunks)} chunks for paper {paper_id}")
+            if eq_text and not eq_text.isspace():
+                chunks.append(Chunk(
+                    text_content=eq_text,
+                    source_paper_id=paper_id,
+                    section_header=eq_section,
+                    content_type="equation",
+                    chunk_id=f"{paper_id}_equation_{eq_idx}",
+                    extra={"needs_vision_processing": equation.get("needs_vision_processing", False)}
+                ))
+        
+        logger.debug("Created %d chunks for paper %s", len(chunks), paper_id)
         return chunks
     
-    def chunk_all_papers(self, json_dir: str = "data/parsed_json") -> List[Dict[str, Any]]:
+    def chunk_all_papers(self, json_dir: str = "data/parsed_json") -> Iterator[Chunk]:
         """
         Chunk all parsed papers in a directory.
         
+        Chunks are streamed to all_chunks.jsonl (one chunk per line) as they
+        are produced, so the full chunk list is never held in memory. The
+        file is complete once the generator has been exhausted.
+        
+        Runs are incremental: a manifest records the modification time and
+        byte range in the output of each chunked JSON file. Chunks of papers
+        that changed or were removed since the last run are dropped from the
+        output (see drop_stale_papers), and only new or changed papers are
+        chunked, appended and yielded. A paper's chunks are written as one
+        unit after all of them have been yielded, so stopping early never
+        leaves part of a paper in the output.
+        
+        IDs of dropped chunks that were not produced again are kept in the
+        manifest until pop_stale_chunk_ids is called, so whoever indexes the
+        output can delete them from the vector store.
+        
         Args:
             json_dir: Directory containing parsed JSON files
             
-        Returns:
-            List of all chunks from all papers
+        Yields:
+            Chunks from all new or changed papers
         """
-        json_dir = Path(json_dir)
-        json_files = list(json_dir.glob("*.json"))
+        output_file = self.output_dir / "all_chunks.jsonl"
+        json_files = sorted(Path(json_dir).glob("*.json"))
+        
+        self.drop_stale_papers(json_dir)
+        manifest = self._load_manifest()
+        if not output_file.exists() or manifest["size"] > output_file.stat().st_size:
+            # Output is missing or shorter than recorded: rebuild from scratch
+            manifest = {"size": 0, "papers": {}, "stale_ids": manifest["stale_ids"]}
+        papers = manifest["papers"]
+        size = manifest["size"]
+        stale_ids = set(manifest["stale_ids"])
+        pending = [json_file for json_file in json_files if str(json_file) not in papers]
+        # Snapshot before chunking, so a file rewritten meanwhile is seen as changed next run
+        mtimes = {str(json_file): json_file.stat().st_mtime for json_file in pending}
         
-        all_chunks = []
+        logger.info("Chunking %d of %d papers", len(pending), len(json_files))
+        total_chunks = 0
         
-        for json_file in tqdm(json_files, desc="Chunking papers"):
+        with open(output_file, 'r+b' if output_file.exists() else 'wb') as f:
+            # Discard anything written after the last recorded paper, e.g. by a crash
+            f.truncate(size)
+            f.seek(size)
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    paper_data = json.load(f)
-                
-                chunks = self.chunk_parsed_paper(paper_data)
-                all_chunks.extend(chunks)
-                
-            except Exception as e:
-                logger.error(f"Error chunking {json_file}: {str(e)}")
-                continue
+                for json_file, chunks in self._iter_paper_chunks(pending):
+                    yield from chunks
+                    data = b"".join(orjson.dumps(chunk.to_dict()) + b"\n" for chunk in chunks)
+                    f.write(data)
+                    papers[str(json_file)] = [mtimes[str(json_file)], size, size + len(data), len(chunks)]
+                    size += len(data)
+                    total_chunks += len(chunks)
+                    # Chunks produced again are live, not stale
+                    stale_ids.difference_update(chunk.chunk_id for chunk in chunks)
+            finally:
+                # Record progress even if the consumer stops early
+                f.flush()
+                self._save_manifest({"size": size, "papers": papers, "stale_ids": sorted(stale_ids)})
+        
+        logger.info("Saved %d new chunks to %s", total_chunks, output_file)
+    
+    def drop_stale_papers(self, json_dir: str = "data/parsed_json") -> List[str]:
+        """
+        Remove chunks of changed or deleted papers from all_chunks.jsonl.
+        
+        The output is compacted to the chunks of papers whose JSON file is
+        unchanged since it was chunked, and the manifest is updated to match,
+        so the next chunk_all_papers run chunks the changed papers again.
+        chunk_all_papers calls this itself; the removed IDs are also recorded
+        for pop_stale_chunk_ids.
         
-        # Save all chunks to a single file
-        output_file = self.output_dir / "all_chunks.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(all_chunks, f, indent=2, ensure_ascii=False)
+        Args:
+            json_dir: Directory containing parsed JSON files
+        
+        Returns:
+            Chunk IDs that were removed, for deleting from the vector store
+        """
+        output_file = self.output_dir / "all_chunks.jsonl"
+        if not output_file.exists():
+            return []
+        
+        manifest = self._load_manifest()
+        mtimes = {str(json_file): json_file.stat().st_mtime for json_file in Path(json_dir).glob("*.json")}
+        stale = {path for path, entry in manifest["papers"].items() if mtimes.get(path) != entry[0]}
+        if not stale:
+            return []
+        
+        # Forget everything until the compacted file is in place, so an
+        # interrupted compaction leads to a full rebuild rather than bad offsets
+        self._save_manifest({"size": 0, "papers": {}, "stale_ids": manifest["stale_ids"]})
         
-        logger.info(f"Saved {len(all_chunks)} total chunks to {output_file}")
-        return all_chunks
+        stale_ids = []
+        papers = {}
+        size = 0
+        tmp_file = output_file.with_suffix(".jsonl.tmp")
+        with open(output_file, 'rb') as src, open(tmp_file, 'wb') as dst:
+            for path, (mtime, begin, end, count) in sorted(manifest["papers"].items(), key=lambda item: item[1][1]):
+                src.seek(begin)
+                data = src.read(end - begin)
+                if path in stale:
+                    stale_ids.extend(orjson.loads(line)["metadata"]["chunk_id"] for line in data.splitlines())
+                    continue
+                dst.write(data)
+                papers[path] = [mtime, size, size + len(data), count]
+                size += len(data)
+        os.replace(tmp_file, output_file)
+        self._save_manifest({"size": size, "papers": papers,
+                             "stale_ids": sorted(set(manifest["stale_ids"]).union(stale_ids))})
+        
+        logger.info("Dropped %d chunks of %d changed or removed papers", len(stale_ids), len(stale))
+        return stale_ids
     
-    def get_chunk_statistics(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def pop_stale_chunk_ids(self) -> List[str]:
+        """
+        Return and forget the IDs of chunks removed from all_chunks.jsonl.
+        
+        These are the chunks of changed or deleted papers that no later
+        chunk_all_papers run has produced again. Delete them from the vector
+        store after indexing the output.
+        
+        Returns:
+            Chunk IDs no longer present in the output
+        """
+        manifest = self._load_manifest()
+        stale_ids = manifest["stale_ids"]
+        if stale_ids:
+            manifest["stale_ids"] = []
+            self._save_manifest(manifest)
+        return stale_ids
+    
+    def get_output_totals(self) -> Dict[str, int]:
+        """
+        Get totals for all chunks in all_chunks.jsonl, from the manifest.
+        
+        Returns:
+            Dictionary with total_chunks and unique_papers
+        """
+        papers = self._load_manifest()["papers"]
+        return {
+            "total_chunks": sum(entry[3] for entry in papers.values()),
+            "unique_papers": len(papers)
+        }
+    
+    def chunk_shard(self, shard_file: str = "data/parsed_json/parsed_papers.jsonl") -> Iterator[Chunk]:
+        """
+        Chunk all parsed papers in a JSON Lines shard.
+        
+        Unlike chunk_all_papers, nothing is written to disk, so chunks can be
+        streamed straight into the bulk indexer.
+        
+        Args:
+            shard_file: Shard with one parsed paper per line, as written by
+                ScientificPDFParser.parse_all_pdfs(write_shard=True)
+            
+        Yields:
+            Chunks from all papers in the shard
+        """
+        for chunks in self._iter_shard_chunks(Path(shard_file)):
+            yield from chunks
+    
+    def _iter_paper_chunks(self, json_files: List[Path]) -> Iterator[Tuple[Path, List[Chunk]]]:
+        """
+        Load and chunk each parsed paper.
+        
+        Args:
+            json_files: Parsed JSON files to chunk
+            
+        Yields:
+            Tuples of (json_file, chunks) for each paper chunked successfully
+        """
+        # Papers are independent, so chunk them in parallel; results come
+        # back in file order and are consumed by a single writer
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            results = _map_bounded(executor, _chunk_file, json_files,
+                                   self.max_workers * SUBMIT_WINDOW_PER_WORKER)
+            for json_file, chunks in tqdm(zip(json_files, results),
+                                          total=len(json_files), desc="Chunking papers"):
+                if chunks is not None:
+                    yield json_file, chunks
+    
+    def _iter_shard_chunks(self, shard_file: Path) -> Iterator[List[Chunk]]:
+        """
+        Load and chunk each parsed paper in a JSON Lines shard.
+        
+        Args:
+            shard_file: Shard with one parsed paper per line
+            
+        Yields:
+            Chunks of each paper chunked successfully, in shard order
+        """
+        with open(shard_file, 'rb') as f, ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            results = _map_bounded(executor, _chunk_line, f, self.max_workers * SUBMIT_WINDOW_PER_WORKER)
+            for chunks in tqdm(results, desc="Chunking papers"):
+                if chunks is not None:
+                    yield chunks
+    
+    def _load_manifest(self) -> Dict[str, Any]:
+        """
+        Load the incremental chunking manifest.
+        
+        Returns:
+            Dictionary with the recorded output size, a "papers" mapping
+            from JSON file paths to [mtime, start, end, chunk_count], and the
+            "stale_ids" of removed chunks not yet handed to a caller
+        """
+        manifest_file = self.output_dir / MANIFEST_FILENAME
+        try:
+            manifest = orjson.loads(manifest_file.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            manifest = {}
+        if "papers" not in manifest:
+            # Missing or written by an older version: rebuild from scratch
+            return {"size": 0, "papers": {}, "stale_ids": []}
+        manifest.setdefault("stale_ids", [])
+        return manifest
+    
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        """
+        Save the incremental chunking manifest.
+        
+        Args:
+            manifest: Dictionary with the output size and per-paper entries
+        """
+        manifest_file = self.output_dir / MANIFEST_FILENAME
+        manifest_file.write_bytes(orjson.dumps(manifest))
+    
+    def get_chunk_statistics(self, chunks: List[Chunk]) -> Dict[str, Any]:
         """
         Get statistics about the chunks.
         
@@ -180,23 +569,15 @@ class ScientificChunker:
         if not chunks:
             return {}
         
-        # Count by content type
-        content_type_counts = {}
-        section_counts = {}
-        paper_counts = {}
+        # Count by content type, section and paper
+        num_chunks = len(chunks)
+        content_type_counts = _count_values((chunk.content_type for chunk in chunks), num_chunks)
+        section_counts = _count_values((chunk.section_header for chunk in chunks), num_chunks)
+        paper_counts = _count_values((chunk.source_paper_id for chunk in chunks), num_chunks)
         
-        total_text_length = 0
-        
-        for chunk in chunks:
-            content_type = chunk["metadata"]["content_type"]
-            section = chunk["metadata"]["section_header"]
-            paper_id = chunk["metadata"]["source_paper_id"]
-            
-            content_type_counts[content_type] = content_type_counts.get(content_type, 0) + 1
-            section_counts[section] = section_counts.get(section, 0) + 1
-            paper_counts[paper_id] = paper_counts.get(paper_id, 0) + 1
-            
-            total_text_length += len(chunk["text_content"])
+        total_text_length = int(np.fromiter(
+            (len(chunk.text_content) for chunk in chunks), dtype=np.int64, count=num_chunks
+        ).sum())
         
         stats = {
             "total_chunks": len(chunks),
@@ -213,19 +594,20 @@ def main():
     """Main function to run the chunker."""
     chunker = ScientificChunker()
     
-    # Chunk all parsed papers
-    all_chunks = chunker.chunk_all_papers()
+    # Chunk all new or changed papers
+    new_chunks = list(chunker.chunk_all_papers())
     
-    # Get statistics
-    stats = chunker.get_chunk_statistics(all_chunks)
+    # Get statistics; totals cover chunks kept from earlier runs as well
+    stats = chunker.get_chunk_statistics(new_chunks)
+    totals = chunker.get_output_totals()
     
     print(f"\nChunking Summary:")
-    print(f"- Total chunks created: {stats.get('total_chunks', 0)}")
-    print(f"- Unique papers processed: {stats.get('unique_papers', 0)}")
-    print(f"- Average chunk length: {stats.get('average_chunk_length', 0):.1f} characters")
-    print(f"- Output file: {chunker.output_dir}/all_chunks.json")
+    print(f"- Total chunks: {totals['total_chunks']} ({len(new_chunks)} new)")
+    print(f"- Unique papers processed: {totals['unique_papers']}")
+    print(f"- Average new chunk length: {stats.get('average_chunk_length', 0):.1f} characters")
+    print(f"- Output file: {chunker.output_dir}/all_chunks.jsonl")
     
-    print(f"\nContent Type Distribution:")
+    print(f"\nContent Type Distribution (new chunks):")
     for content_type, count in stats.get('content_type_distribution', {}).items():
         print(f"  - {content_type}: {count}")
 
@@ -6,8 +6,11 @@ category and saves them as PDF files.
 """
 
 import arxiv
+import asyncio
+import httpx
 import os
 from pathlib import Path
+from typing import List, Tuple
 from tqdm import tqdm
 import logging
 
@@ -15,6 +18,9 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The arxiv library logs every page request at INFO
+logging.getLogger("arxiv").setLevel(logging.WARNING)
+
 class ArxivDownloader:
     """Downloads scientific papers from arXiv."""
     
@@ -28,15 +34,17 @@ class ArxivDownloader:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-    def download_papers(self, category: str = "q-bio.NC", max_results: int = 100):
+    def download_papers(self, category: str = "q-bio.NC", max_results: int = 100,
+                        max_concurrency: int = 6):
         """
         Download papers from arXiv.
         
         Args:
             category: arXiv category to search (default: q-bio.NC for Neurons and Cognition)
             max_results: Maximum number of papers to download
+            max_concurrency: Maximum number of PDFs downloaded at the same time
         """
-        logger.info(f"Searching for papers in category: {category}")
+        logger.info("Searching for papers in category: %s", category)
         
         # Search for papers in the specified category
         search = arxiv.Search(
@@ -46,30 +54,81 @@ class ArxivDownloader:
             sort_order=arxiv.SortOrder.Descending
         )
         
+        # Collect the PDFs that still need downloading
+        pending = []
+        
+        for result in tqdm(search.results(), total=max_results, desc="Collecting papers"):
+            # Create filename from entry ID
+            filename = f"{result.entry_id.split('/')[-1]}.pdf"
+            filepath = self.output_dir / filename
+            
+            # Skip if file already exists
+            if filepath.exists():
+                logger.debug("File already exists: %s", filename)
+                continue
+            
+            if not result.pdf_url:
+                logger.error("Error downloading %s: no PDF link", result.entry_id)
+                continue
+            
+            pending.append((result.pdf_url, filepath))
+        
+        # Download the PDFs concurrently
+        downloaded_count = asyncio.run(self._download_all(pending, max_concurrency))
+        
+        logger.info("Download completed. %d papers downloaded to %s", downloaded_count, self.output_dir)
+        return downloaded_count
+    
+    async def _download_all(self, pending: List[Tuple[str, Path]], max_concurrency: int) -> int:
+        """
+        Download PDFs in concurrent batches over a shared HTTP client.
+        
+        Args:
+            pending: List of (pdf_url, filepath) pairs to download
+            max_concurrency: Number of downloads per batch
+            
+        Returns:
+            Number of PDFs downloaded successfully
+        """
         downloaded_count = 0
+        limits = httpx.Limits(max_connections=8)
         
-        for result in tqdm(search.results(), total=max_results, desc="Downloading papers"):
-            try:
-                # Create filename from entry ID
-                filename = f"{result.entry_id.split('/')[-1]}.pdf"
-                filepath = self.output_dir / filename
-                
-                # Skip if file already exists
-                if filepath.exists():
-                    logger.info(f"File already exists: {filename}")
-                    continue
+        async with httpx.AsyncClient(limits=limits, follow_redirects=True, timeout=60.0) as client:
+            for start in range(0, len(pending), max_concurrency):
+                # Pause between batches to respect arXiv's rate limits
+                if start:
+                    await asyncio.sleep(3)
                 
-                # Download the PDF
-                result.download_pdf(filename=str(filepath))
-                downloaded_count += 1
-                logger.info(f"Downloaded: {filename}")
-                
-            except Exception as e:
-                logger.error(f"Error downloading {result.entry_id}: {str(e)}")
-                continue
+                batch = pending[start:start + max_concurrency]
+                results = await asyncio.gather(
+                    *(self._fetch(client, url, filepath) for url, filepath in batch)
+                )
+                downloaded_count += sum(results)
         
-        logger.info(f"Download completed. {downloaded_count} papers downloaded to {self.output_dir}")
         return downloaded_count
+    
+    async def _fetch(self, client: httpx.AsyncClient, url: str, filepath: Path) -> bool:
+        """
+        Download a single PDF.
+        
+        Args:
+            client: Shared HTTP client
+            url: URL of the PDF
+            filepath: Path to save the PDF to
+            
+        Returns:
+            True if the PDF was downloaded, False otherwise
+        """
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+            filepath.write_bytes(response.content)
+            logger.debug("Downloaded: %s", filepath.name)
+            return True
+            
+        except Exception as e:
+            logger.error("Error downloading %s: %s", url, e)
+            return False
 
 def main():
     """Main function to run the downloader."""
@@ -0,0 +1,100 @@
+"""
+Bulk Indexer
+
+This module streams chunks into the vector store in batches, embedding each
+batch with a single encoder call and inserting it with a single upsert.
+"""
+
+import hashlib
+import logging
+from typing import Dict, Iterable, Iterator, List
+
+from .chunker import Chunk, ChunkBatch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def batched(chunks: Iterable[Chunk], batch_size: int = 256) -> Iterator[List[Chunk]]:
+    """
+    Group chunks into lists of at most batch_size.
+
+    Args:
+        chunks: Iterable of chunks
+        batch_size: Maximum number of chunks per batch
+
+    Yields:
+        Lists of chunks
+    """
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _drop_duplicates(batch: List[Chunk], seen: Dict[bytes, str]) -> List[Chunk]:
+    """
+    Remove chunks whose text has already been seen.
+
+    Args:
+        batch: Chunks to filter
+        seen: Content hash -> chunk_id of already seen texts, updated in place
+
+    Returns:
+        Chunks with previously unseen text
+    """
+    unique = []
+    for chunk in batch:
+        digest = hashlib.blake2b(chunk.text_content.encode("utf-8", errors="ignore"), digest_size=16).digest()
+        if digest in seen:
+            logger.debug("Skipping chunk %s, duplicate of %s", chunk.chunk_id, seen[digest])
+            continue
+        seen[digest] = chunk.chunk_id
+        unique.append(chunk)
+    return unique
+
+def bulk_index(batches: Iterable[List[Chunk]], vector_store, embedder,
+               encode_batch_size: int = 64) -> int:
+    """
+    Embed and insert batches of chunks into the vector store.
+
+    Each batch is encoded with one call to the sentence transformer and
+    written with one upsert, so the number of round-trips to ChromaDB is
+    the number of batches rather than the number of chunks. Chunks whose
+    text was already seen earlier in the run are skipped.
+
+    Args:
+        batches: Iterable of chunk lists, e.g. batched(ScientificChunker.chunk_all_papers())
+        vector_store: ChromaVectorStore to insert into
+        embedder: SentenceTransformerEmbedder used to encode the chunks
+        encode_batch_size: Batch size for the encoder forward passes
+
+    Returns:
+        Number of chunks indexed (excluding skipped duplicates)
+    """
+    indexed = 0
+    skipped = 0
+    # Content hash -> chunk_id of the first chunk with that text
+    seen: Dict[bytes, str] = {}
+
+    for batch in batches:
+        unique = _drop_duplicates(batch, seen)
+        skipped += len(batch) - len(unique)
+        batch = unique
+        if not batch:
+            continue
+
+        # Columns are built once and handed to the encoder and ChromaDB as is
+        columns = ChunkBatch.from_chunks(batch)
+        embeddings = embedder.embed_documents(columns.texts, batch_size=encode_batch_size, show_progress_bar=False)
+
+        vector_store.upsert(columns.chunk_ids, embeddings, columns.texts, columns.metadatas())
+
+        indexed += len(columns)
+        logger.debug("Indexed batch of %d chunks (%d total)", len(batch), indexed)
+
+    logger.info("Bulk indexing completed. %d chunks indexed, %d duplicates skipped", indexed, skipped)
+    return indexed
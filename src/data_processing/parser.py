@@ -1,14 +1,22 @@
 """
 Scientific PDF Parser
 
-This module parses scientific PDFs using the unstructured library and extracts
-structured content including text, tables, and equations.
+This module parses scientific PDFs using PyMuPDF (falling back to the
+unstructured library for scanned documents) and extracts structured content
+including text, tables, and equations.
 """
 
-import json
+import io
 import logging
+import os
+import orjson
+import pymupdf
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from pdfminer.pdfparser import PDFSyntaxError
 from unstructured.partition.pdf import partition_pdf
 from unstructured.documents.elements import (
     Title, NarrativeText, ListItem, Table, 
@@ -20,65 +28,162 @@ import re
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patterns are matched case-insensitively so callers don't have to lower()
+# the text; (?-i:...) marks the parts that really need capital letters.
+
+# "Abstract" as a whole word, on its own or followed by a colon, newline or
+# capital letter (but not "Abstraction", "Abstracts of talks", ...)
+_ABSTRACT_RE = re.compile(r"abstract\b\s*(?:$|:|\n|(?-i:[A-Z]))", re.IGNORECASE)
+
+# Common section headers in scientific papers
+_SECTION_RE = re.compile(
+    r"(?:\d+\.\s*(?-i:[A-Z])"
+    r"|(?-i:[A-Z][A-Z\s]+)$"
+    r"|(?:introduction|methods?|results?|discussion|conclusion|references?"
+    r"|bibliography|acknowledgments?|appendix)\s*$)",
+    re.IGNORECASE
+)
+
+# Mathematical symbols, checked by set membership rather than a regex scan
+_MATH_SYMBOLS = frozenset("∑∫∂∇∞±×÷√")
+
+# LaTeX commands or escaped brackets. Any LaTeX command (\frac, \sum,
+# \alpha, ...) is covered by the backslash-letter case.
+_LATEX_RE = re.compile(r"\\[a-zA-Z{}()\[\]]")
+
+# Below this many extracted characters a PDF is treated as scanned
+MIN_TEXT_LAYER_CHARS = 100
+
+# Lines at least this many points larger than the body font are headings
+HEADING_SIZE_DELTA = 1.0
+
+# Single file holding every parsed paper, one JSON document per line
+PARSED_SHARD_FILENAME = "parsed_papers.jsonl"
+
+# Number of PDFs read ahead while parsing in-process
+PREFETCH_FILES = 4
+
+# Running headers, section names and equation labels repeat within and
+# across papers, so the predicates below are memoized on the text.
+
+@lru_cache(maxsize=4096)
+def _is_abstract(text: str) -> bool:
+    """Check if text is an abstract."""
+    return _ABSTRACT_RE.match(text) is not None
+
+@lru_cache(maxsize=4096)
+def _is_section_header(text: str) -> bool:
+    """Check if text is a section header."""
+    return _SECTION_RE.match(text) is not None
+
+@lru_cache(maxsize=4096)
+def _might_be_equation(text: str) -> bool:
+    """Check if text might contain an equation."""
+    if not _MATH_SYMBOLS.isdisjoint(text):
+        return True
+    return "\\" in text and _LATEX_RE.search(text) is not None
+
+# Element type -> (is Title, content kind, type name), filled on first sight
+_ELEMENT_INFO: Dict[type, Tuple[bool, str, str]] = {}
+
+def _element_info(element_type: type) -> Tuple[bool, str, str]:
+    """
+    Classify an element type once so the per-element loop needs a single
+    dict lookup instead of repeated isinstance checks.
+    
+    Args:
+        element_type: Class of an unstructured element
+        
+    Returns:
+        Tuple of (is a Title, content kind, class name)
+    """
+    info = _ELEMENT_INFO.get(element_type)
+    if info is None:
+        if issubclass(element_type, (NarrativeText, ListItem, Text)):
+            kind = "text"
+        elif issubclass(element_type, Table):
+            kind = "table"
+        else:
+            kind = "other"
+        info = (issubclass(element_type, Title), kind, element_type.__name__)
+        _ELEMENT_INFO[element_type] = info
+    return info
+
 class ScientificPDFParser:
     """Parser for scientific PDF documents."""
     
-    def __init__(self, output_dir: str = "data/parsed_json"):
+    def __init__(self, output_dir: str = "data/parsed_json", strategy: str = "fast",
+                 backend: str = "pymupdf"):
         """
         Initialize the parser.
         
         Args:
             output_dir: Directory to save parsed JSON files
+            strategy: partition_pdf strategy; 'fast' reads the embedded text layer,
+                'hi_res' runs layout detection and OCR (much slower)
+            backend: 'pymupdf' to read the text layer directly, using unstructured
+                only for scanned PDFs, or 'unstructured' to always use partition_pdf
         """
+        if backend not in ("pymupdf", "unstructured"):
+            raise ValueError(f"Unknown backend {backend!r}, expected 'pymupdf' or 'unstructured'")
+        
         self.output_dir = Path(output_dir)
+        self.strategy = strategy
+        self.backend = backend
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-    def parse_scientific_pdf(self, pdf_path: str) -> Dict[str, Any]:
+    def parse_scientific_pdf(self, pdf_path: str, force: bool = False,
+                             data: Optional[bytes] = None) -> Dict[str, Any]:
         """
         Parse a scientific PDF and extract structured content.
         
+        If the JSON output for this PDF is already newer than the PDF, it is
+        loaded instead of parsing the PDF again.
+        
         Args:
             pdf_path: Path to the PDF file
+            force: Re-parse even if an up-to-date JSON output exists
+            data: Contents of the PDF if already read, to avoid reading it again
             
         Returns:
             Dictionary containing structured representation of the paper
         """
         pdf_path = Path(pdf_path)
+        
+        if not force:
+            cached = self._load_cached(pdf_path)
+            if cached:
+                return cached
+        
         logger.info(f"Parsing PDF: {pdf_path.name}")
 
         try:
+            elements = None
+            if self.backend == "pymupdf":
+                elements = self._parse_with_pymupdf(pdf_path, data)
+                if elements is None:
+                    logger.info(f"No usable text layer in {pdf_path.name}, using unstructured")
+            
             # Parse PDF using unstructured library
-            # Try fast strategy first, fallback to hi_res if needed
-            try:
-                elements = partition_pdf(
-                    str(pdf_path),
-                    strategy="fast",
-                    include_metadata=True
-                )
-            except Exception as fast_error:
-                logger.warning(f"Fast parsing failed for {pdf_path.name}, trying hi_res: {str(fast_error)}")
+            if elements is None:
                 try:
-                    elements = partition_pdf(
-                        str(pdf_path),
-                        strategy="hi_res",
-                        include_metadata=True
-                    )
-                except Exception as hi_res_error:
-                    logger.error(f"Both fast and hi_res parsing failed for {pdf_path.name}: {str(hi_res_error)}")
-                    # Try with basic strategy as last resort
-                    elements = partition_pdf(
-                        str(pdf_path),
-                        strategy="auto",
-                        include_metadata=True
-                    )
+                    elements = self._partition(pdf_path, self.strategy, data)
+                except (PDFSyntaxError, ValueError) as parse_error:
+                    # Only malformed PDFs fall back to the slow layout/OCR path
+                    if self.strategy == "hi_res":
+                        raise
+                    logger.warning(f"{self.strategy} parsing failed for {pdf_path.name}, trying hi_res: {str(parse_error)}")
+                    elements = self._partition(pdf_path, "hi_res", data)
 
             # Extract paper structure
             paper_data = self._extract_paper_structure(elements, pdf_path.stem)
 
-            # Save to JSON
+            # Save to JSON through a temporary file, so an interrupted write
+            # never leaves a truncated file that looks up to date
             output_file = self.output_dir / f"{pdf_path.stem}.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(paper_data, f, indent=2, ensure_ascii=False)
+            tmp_file = output_file.with_name(output_file.name + ".tmp")
+            tmp_file.write_bytes(orjson.dumps(paper_data))
+            os.replace(tmp_file, output_file)
 
             logger.info(f"Parsed paper saved to: {output_file}")
             return paper_data
@@ -87,12 +192,98 @@ class ScientificPDFParser:
             logger.error(f"Error parsing {pdf_path}: {str(e)}")
             return {}
     
-    def _extract_paper_structure(self, elements: List, paper_id: str) -> Dict[str, Any]:
+    def _parse_with_pymupdf(self, pdf_path: Path, data: Optional[bytes] = None) -> Optional[List[Text]]:
+        """
+        Extract elements from the PDF's text layer with PyMuPDF.
+        
+        Lines set noticeably larger than the body font become Title elements,
+        and consecutive body lines of a text block become one NarrativeText.
+        The body font size is the size covering the most characters.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            data: Contents of the PDF if already read
+            
+        Returns:
+            List of elements, or None if the PDF has almost no text layer
+            (e.g. a scanned document)
+        """
+        # (font size, text) for every non-empty line, None between blocks
+        lines: List[Optional[Tuple[float, str]]] = []
+        size_chars = Counter()
+        
+        if data is not None:
+            doc = pymupdf.open(stream=data, filetype="pdf")
+        else:
+            doc = pymupdf.open(pdf_path)
+        
+        with doc:
+            for page in doc:
+                for block in page.get_text("dict")["blocks"]:
+                    if block["type"] != 0:
+                        continue
+                    for line in block["lines"]:
+                        spans = line["spans"]
+                        text = "".join(span["text"] for span in spans).strip()
+                        if not text:
+                            continue
+                        size = round(max(span["size"] for span in spans), 1)
+                        size_chars[size] += len(text)
+                        lines.append((size, text))
+                    lines.append(None)
+        
+        if sum(size_chars.values()) < MIN_TEXT_LAYER_CHARS:
+            return None
+        
+        heading_size = size_chars.most_common(1)[0][0] + HEADING_SIZE_DELTA
+        
+        elements = []
+        current_type = None
+        current_lines = []
+        for line in lines + [None]:
+            line_type = None
+            if line is not None:
+                line_type = Title if line[0] >= heading_size else NarrativeText
+            if line_type is not current_type and current_lines:
+                elements.append(current_type(text=" ".join(current_lines)))
+                current_lines = []
+            current_type = line_type
+            if line is not None:
+                current_lines.append(line[1])
+        
+        return elements
+    
+    def _partition(self, pdf_path: Path, strategy: str, data: Optional[bytes] = None) -> List:
+        """
+        Run partition_pdf without the optional image and table extraction.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            strategy: partition_pdf strategy
+            data: Contents of the PDF if already read
+            
+        Returns:
+            List of parsed elements
+        """
+        if data is not None:
+            source = {"file": io.BytesIO(data)}
+        else:
+            source = {"filename": str(pdf_path)}
+        return partition_pdf(
+            **source,
+            strategy=strategy,
+            include_metadata=True,
+            infer_table_structure=False,
+            extract_images_in_pdf=False,
+            languages=["eng"]
+        )
+    
+    def _extract_paper_structure(self, elements: Iterable, paper_id: str) -> Dict[str, Any]:
         """
         Extract structured content from parsed elements.
         
         Args:
-            elements: List of parsed elements from unstructured
+            elements: Parsed elements from unstructured, consumed in a single pass
             paper_id: ID of the paper
             
         Returns:
@@ -111,6 +302,15 @@ class ScientificPDFParser:
         current_section = None
         current_section_content = []
         
+        # Bind lookups used for every element to locals
+        element_info = _element_info
+        is_abstract = _is_abstract
+        is_section_header = _is_section_header
+        might_be_equation = _might_be_equation
+        sections_append = paper_data["sections"].append
+        tables_append = paper_data["tables"].append
+        equations_append = paper_data["equations"].append
+        
         for element in elements:
             element_text = str(element).strip()
             
@@ -118,21 +318,23 @@ class ScientificPDFParser:
             if not element_text:
                 continue
             
+            is_title, kind, type_name = element_info(type(element))
+            
             # Extract title (usually first Title element)
-            if isinstance(element, Title) and not paper_data["title"]:
+            if is_title and not paper_data["title"]:
                 paper_data["title"] = element_text
                 continue
             
             # Extract abstract (look for "Abstract" or "ABSTRACT" followed by text)
-            if self._is_abstract(element_text):
+            if is_abstract(element_text):
                 paper_data["abstract"] = element_text
                 continue
             
             # Extract section headers (Title elements that might be section headers)
-            if isinstance(element, Title) and self._is_section_header(element_text):
+            if is_title and is_section_header(element_text):
                 # Save previous section if exists
                 if current_section:
-                    paper_data["sections"].append({
+                    sections_append({
                         "header": current_section,
                         "content": current_section_content
                     })
@@ -143,36 +345,36 @@ class ScientificPDFParser:
                 continue
             
             # Handle narrative text and other content types
-            if isinstance(element, (NarrativeText, ListItem, Text)):
+            if kind == "text":
                 # Add content to current section or create a default section
                 if not current_section:
                     current_section = "Introduction"
                     current_section_content = []
                 
                 content_item = {
-                    "type": type(element).__name__,
+                    "type": type_name,
                     "text": element_text
                 }
                 current_section_content.append(content_item)
                 continue
             
             # Extract tables
-            if isinstance(element, Table):
+            if kind == "table":
                 table_data = {
                     "content": element_text,
                     "section": current_section or "Unknown"
                 }
-                paper_data["tables"].append(table_data)
+                tables_append(table_data)
                 continue
             
             # Extract equations (placeholder for vision-to-LaTeX model)
-            if self._might_be_equation(element_text):
+            if might_be_equation(element_text):
                 equation_data = {
                     "text": element_text,
                     "section": current_section or "Unknown",
                     "needs_vision_processing": True
                 }
-                paper_data["equations"].append(equation_data)
+                equations_append(equation_data)
                 continue
             
             # Handle any other element types
@@ -181,115 +383,178 @@ class ScientificPDFParser:
                 current_section_content = []
             
             content_item = {
-                "type": type(element).__name__,
+                "type": type_name,
                 "text": element_text
             }
             current_section_content.append(content_item)
         
         # Add final section
         if current_section:
-            paper_data["sections"].append({
+            sections_append({
                 "header": current_section,
                 "content": current_section_content
             })
         
         return paper_data
     
-    def _serialize_metadata(self, metadata: Any) -> Dict[str, Any]:
+    def _is_cached(self, pdf_path: Path) -> bool:
+        """Check if the JSON output for a PDF exists and is newer than the PDF."""
+        output_file = self.output_dir / f"{pdf_path.stem}.json"
+        try:
+            return output_file.stat().st_mtime >= pdf_path.stat().st_mtime
+        except OSError:
+            return False
+    
+    def _load_cached(self, pdf_path: Path) -> Dict[str, Any]:
         """
-        Convert metadata to JSON-serializable format.
+        Load the previously parsed JSON output for a PDF.
         
         Args:
-            metadata: Metadata object from unstructured
+            pdf_path: Path to the PDF file
             
         Returns:
-            JSON-serializable dictionary
+            Parsed paper data, or an empty dict if there is no usable cache
         """
-        if not metadata:
+        if not self._is_cached(pdf_path):
             return {}
         
+        output_file = self.output_dir / f"{pdf_path.stem}.json"
         try:
-            # Try to convert to dict if it's an object
-            if hasattr(metadata, '__dict__'):
-                return {k: str(v) for k, v in metadata.__dict__.items()}
-            elif isinstance(metadata, dict):
-                return {k: str(v) for k, v in metadata.items()}
-            else:
-                return {"raw": str(metadata)}
-        except Exception:
-            return {"raw": str(metadata)}
-    
-    def _is_abstract(self, text: str) -> bool:
-        """Check if text is an abstract."""
-        abstract_patterns = [
-            r"^abstract\s*$",
-            r"^abstract\s*:",
-            r"^abstract\s*\n",
-            r"^abstract\s*[A-Z]"
-        ]
-        return any(re.match(pattern, text.lower()) for pattern in abstract_patterns)
-    
-    def _is_section_header(self, text: str) -> bool:
-        """Check if text is a section header."""
-        # Common section headers in scientific papers
-        section_patterns = [
-            r"^\d+\.\s*[A-Z]",
-            r"^[A-Z][A-Z\s]+$",
-            r"^introduction\s*$",
-            r"^methods?\s*$",
-            r"^results?\s*$",
-            r"^discussion\s*$",
-            r"^conclusion\s*$",
-            r"^references?\s*$",
-            r"^bibliography\s*$",
-            r"^acknowledgments?\s*$",
-            r"^appendix\s*$"
-        ]
-        return any(re.match(pattern, text.lower()) for pattern in section_patterns)
-    
-    def _might_be_equation(self, text: str) -> bool:
-        """Check if text might contain an equation."""
-        # Look for mathematical symbols and patterns
-        math_patterns = [
-            r"\\[a-zA-Z]+",  # LaTeX commands
-            r"[∑∫∂∇∞±×÷√]",  # Mathematical symbols
-            r"\\[{}()\[\]]",  # LaTeX brackets
-            r"\\frac\{",      # Fractions
-            r"\\sum_",        # Summation
-            r"\\int_",        # Integration
-            r"\\partial",     # Partial derivative
-            r"\\nabla",       # Nabla
-            r"\\infty",       # Infinity
-            r"\\alpha|\\beta|\\gamma|\\delta|\\epsilon|\\theta|\\lambda|\\mu|\\pi|\\sigma|\\phi|\\psi|\\omega"  # Greek letters
-        ]
-        return any(re.search(pattern, text) for pattern in math_patterns)
+            paper_data = orjson.loads(output_file.read_bytes())
+            logger.debug("Using cached parse for %s", pdf_path.name)
+            return paper_data
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cached parse {output_file}: {str(e)}")
+            return {}
     
-    def parse_all_pdfs(self, pdf_dir: str = "data/raw_pdfs") -> List[Dict[str, Any]]:
+    def parse_all_pdfs(self, pdf_dir: str = "data/raw_pdfs", workers: Optional[int] = None,
+                       force: bool = False, write_shard: bool = False) -> List[Dict[str, Any]]:
         """
         Parse all PDFs in a directory.
         
+        PDFs are parsed in parallel worker processes; each worker writes its
+        own JSON output, so only the parsed dictionary is sent back. PDFs with
+        an up-to-date JSON output are loaded from it without being parsed.
+        
+        Optionally, all parsed papers are also written to a single JSON Lines
+        shard, for bulk consumers such as ScientificChunker.chunk_shard that
+        read one file instead of one file per paper. The
+        main pipeline chunks the per-paper files, so this is off by default.
+        
         Args:
             pdf_dir: Directory containing PDF files
+            workers: Number of worker processes (None for one per CPU, 1 to parse in-process)
+            force: Re-parse every PDF even if an up-to-date JSON output exists
+            write_shard: Also write parsed_papers.jsonl alongside the per-paper JSON files
             
         Returns:
             List of parsed paper data
         """
         pdf_dir = Path(pdf_dir)
         pdf_files = list(pdf_dir.glob("*.pdf"))
+        workers = workers or os.cpu_count()
         
         parsed_papers = []
         
-        for pdf_file in pdf_files:
-            try:
-                paper_data = self.parse_scientific_pdf(str(pdf_file))
+        if not force:
+            uncached_files = []
+            for pdf_file in pdf_files:
+                paper_data = self._load_cached(pdf_file)
                 if paper_data:
                     parsed_papers.append(paper_data)
-            except Exception as e:
-                logger.error(f"Error parsing {pdf_file}: {str(e)}")
-                continue
+                else:
+                    uncached_files.append(pdf_file)
+            if parsed_papers:
+                logger.info(f"Loaded {len(parsed_papers)} papers from cache")
+            pdf_files = uncached_files
+        
+        if workers == 1:
+            # Read upcoming PDFs in background threads while this one is parsed
+            for pdf_file, read in _prefetch(pdf_files):
+                try:
+                    paper_data = self.parse_scientific_pdf(str(pdf_file), force=True, data=read.result())
+                    if paper_data:
+                        parsed_papers.append(paper_data)
+                except Exception as e:
+                    logger.error(f"Error parsing {pdf_file}: {str(e)}")
+                    continue
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    (pdf_file, executor.submit(_parse_one, str(pdf_file), str(self.output_dir), self.strategy, self.backend, True))
+                    for pdf_file in pdf_files
+                ]
+                for pdf_file, future in futures:
+                    try:
+                        paper_data = future.result()
+                        if paper_data:
+                            parsed_papers.append(paper_data)
+                    except Exception as e:
+                        logger.error(f"Error parsing {pdf_file}: {str(e)}")
+                        continue
         
         logger.info(f"Parsed {len(parsed_papers)} papers successfully")
+        
+        if write_shard:
+            self._write_shard(parsed_papers)
+        
         return parsed_papers
+    
+    def _write_shard(self, parsed_papers: List[Dict[str, Any]]):
+        """
+        Write all parsed papers to the JSON Lines shard.
+        
+        Args:
+            parsed_papers: Parsed paper data to write
+        """
+        shard_file = self.output_dir / PARSED_SHARD_FILENAME
+        tmp_file = shard_file.with_name(shard_file.name + ".tmp")
+        with open(tmp_file, 'wb') as f:
+            for paper_data in parsed_papers:
+                f.write(orjson.dumps(paper_data))
+                f.write(b"\n")
+        os.replace(tmp_file, shard_file)
+        logger.info(f"Wrote {len(parsed_papers)} papers to {shard_file}")
+
+def _prefetch(pdf_files: List[Path], depth: int = PREFETCH_FILES) -> Iterator[Tuple[Path, Any]]:
+    """
+    Read PDFs ahead of use in a thread pool.
+    
+    At most depth files are being read or held in memory at once.
+    
+    Args:
+        pdf_files: PDF files in processing order
+        depth: Number of files to read ahead
+        
+    Yields:
+        Tuples of (PDF path, future resolving to the file contents)
+    """
+    with ThreadPoolExecutor(max_workers=depth) as reader:
+        pending = deque()
+        for pdf_file in pdf_files:
+            pending.append((pdf_file, reader.submit(pdf_file.read_bytes)))
+            if len(pending) > depth:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+def _parse_one(pdf_path: str, output_dir: str, strategy: str = "fast", backend: str = "pymupdf",
+               force: bool = False) -> Dict[str, Any]:
+    """
+    Parse a single PDF in a worker process.
+    
+    Defined at module level so it can be pickled for worker processes.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        output_dir: Directory to save the parsed JSON file
+        
+    Returns:
+        Dictionary containing structured representation of the paper
+    """
+    return ScientificPDFParser(
+        output_dir=output_dir, strategy=strategy, backend=backend
+    ).parse_scientific_pdf(pdf_path, force=force)
 
 def main():
     """Main function to run the parser."""
@@ -5,10 +5,12 @@ This module provides the RAG (Retrieval-Augmented Generation) functionality
 using open-source language models for scientific question answering.
 """
 
+import copy
+import importlib.util
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
 import os
 from dotenv import load_dotenv
 
@@ -19,18 +21,88 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Instruction block that starts every prompt; its token ids are computed once
+STATIC_INSTRUCTIONS = """You are an expert scientific researcher and educator. Your task is to answer questions about scientific literature based ONLY on the provided context. 
+
+IMPORTANT INSTRUCTIONS:
+1. Answer the question using ONLY the information provided in the context
+2. If the context doesn't contain enough information to answer the question, say so clearly
+3. Cite your sources using the format [Source X] where X is the source number
+4. Be precise, accurate, and scientific in your response
+5. If you mention specific findings, methods, or results, always cite the source
+6. Use clear, academic language appropriate for scientific communication
+
+CONTEXT:
+"""
+
+def _cuda_load_options() -> Tuple[torch.dtype, str]:
+    """
+    Pick the weight dtype and attention kernel for the current GPU.
+    
+    Ampere (compute capability 8.x) and newer run bfloat16 at fp16 speed
+    without fp16's overflow risk, and can use Flash-Attention-2 when the
+    flash_attn package is installed. Older GPUs use fp16 with PyTorch's
+    scaled-dot-product attention.
+    
+    Returns:
+        Tuple of (torch dtype, attn_implementation name)
+    """
+    if torch.cuda.get_device_capability()[0] >= 8:
+        if importlib.util.find_spec("flash_attn") is not None:
+            return torch.bfloat16, "flash_attention_2"
+        return torch.bfloat16, "sdpa"
+    return torch.float16, "sdpa"
+
+def _bnb_config(quantize: str, compute_dtype: torch.dtype) -> Optional[BitsAndBytesConfig]:
+    """
+    Build a bitsandbytes config for a quantization mode.
+    
+    Args:
+        quantize: 'nf4' for 4-bit NormalFloat weights or 'int8' for 8-bit weights
+        compute_dtype: dtype used for the matmuls of 4-bit layers
+        
+    Returns:
+        Quantization config, or None if bitsandbytes is not installed
+    """
+    if importlib.util.find_spec("bitsandbytes") is None:
+        logger.warning(f"bitsandbytes not installed, ignoring quantize={quantize!r}")
+        return None
+    
+    if quantize == "nf4":
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=compute_dtype,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_use_double_quant=True
+        )
+    if quantize == "int8":
+        return BitsAndBytesConfig(load_in_8bit=True)
+    raise ValueError(f"Unknown quantize mode {quantize!r}, expected 'nf4', 'int8' or None")
+
 class RAGGenerator:
     """RAG generator using open-source language models."""
     
-    def __init__(self, model_name: str = "microsoft/DialoGPT-medium", device: str = None):
+    def __init__(self, model_name: str = "microsoft/DialoGPT-medium", device: str = None,
+                 quantization_config: Optional[BitsAndBytesConfig] = None,
+                 quantize: Optional[str] = "nf4", backend: str = "hf"):
         """
         Initialize the RAG generator.
         
         Args:
             model_name: Name of the language model to use
             device: Device to run the model on ('cpu', 'cuda', or None for auto)
+            quantization_config: bitsandbytes quantization settings (CUDA only),
+                overrides quantize
+            quantize: Weight quantization on CUDA: 'nf4', 'int8' or None for full precision
+            backend: 'hf' for transformers generate(), 'onnx' for the model exported
+                to ONNX Runtime through optimum, or 'vllm' for vLLM's paged-KV engine
+                with prefix caching (quantization options only apply to 'hf')
         """
+        if backend not in ("hf", "onnx", "vllm"):
+            raise ValueError(f"Unknown backend {backend!r}, expected 'hf', 'onnx' or 'vllm'")
+        
         self.model_name = model_name
+        self.backend = backend
         
         # Auto-detect device if not specified
         if device is None:
@@ -39,30 +111,159 @@ class RAGGenerator:
         self.device = device
         logger.info(f"Loading model {model_name} on device {device}")
         
+        # bitsandbytes kernels only run on CUDA
+        if quantization_config is not None and device != "cuda":
+            logger.warning("Quantization requires CUDA, loading unquantized model")
+            quantization_config = None
+        
         try:
+            if backend == "vllm":
+                self._load_vllm(model_name)
+                return
+            
             # Load tokenizer and model
             self.tokenizer = AutoTokenizer.from_pretrained(
                 model_name,
                 trust_remote_code=True
             )
             
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                torch_dtype=torch.float16 if device == "cuda" else torch.float32,
-                device_map="auto" if device == "cuda" else None,
-                trust_remote_code=True
-            )
+            if backend == "onnx":
+                self._load_onnx(model_name)
+            else:
+                self._load_hf(model_name, quantization_config, quantize)
             
             # Set pad token if not set
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
             
+            # Tokenize the instruction block once; prompts only tokenize their tail
+            self._prefix_ids = self.tokenizer(STATIC_INSTRUCTIONS, return_tensors="pt").input_ids
+            self._split_tokenization = self._check_split_tokenization()
+            # ONNX Runtime sessions manage their own KV buffers
+            self._prefix_kv = self._encode_prefix() if backend == "hf" else None
+            
             logger.info(f"Model loaded successfully")
             
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise
     
+    def _load_hf(self, model_name: str, quantization_config: Optional[BitsAndBytesConfig],
+                 quantize: Optional[str]):
+        """
+        Load the model with transformers.
+        
+        Args:
+            model_name: Name of the language model to use
+            quantization_config: bitsandbytes quantization settings, overrides quantize
+            quantize: Weight quantization on CUDA: 'nf4', 'int8' or None
+        """
+        if self.device == "cuda":
+            torch_dtype, attn_implementation = _cuda_load_options()
+            if quantization_config is None and quantize:
+                quantization_config = _bnb_config(quantize, torch_dtype)
+        else:
+            torch_dtype, attn_implementation = torch.float32, None
+        
+        load_kwargs = {
+            "torch_dtype": torch_dtype,
+            "device_map": "auto" if self.device == "cuda" else None,
+            "quantization_config": quantization_config,
+            "trust_remote_code": True
+        }
+        
+        try:
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                attn_implementation=attn_implementation,
+                **load_kwargs
+            )
+        except (ValueError, ImportError) as attn_error:
+            # Not every architecture supports sdpa / Flash-Attention-2
+            if attn_implementation is None:
+                raise
+            logger.warning(f"{attn_implementation} attention unavailable for {model_name}, using default: {str(attn_error)}")
+            self.model = AutoModelForCausalLM.from_pretrained(model_name, **load_kwargs)
+    
+    def _load_onnx(self, model_name: str):
+        """
+        Export the model to ONNX and load it into an ONNX Runtime session.
+        
+        On CUDA, IO binding keeps inputs, outputs and the KV cache on the GPU
+        between decoding steps instead of copying them through host memory.
+        
+        Args:
+            model_name: Name of the language model to use
+        """
+        from optimum.onnxruntime import ORTModelForCausalLM
+        
+        provider = "CUDAExecutionProvider" if self.device == "cuda" else "CPUExecutionProvider"
+        self.model = ORTModelForCausalLM.from_pretrained(
+            model_name,
+            export=True,
+            use_cache=True,
+            use_io_binding=self.device == "cuda",
+            provider=provider
+        )
+    
+    def _check_split_tokenization(self) -> bool:
+        """
+        Check that tokenizing the tail separately matches tokenizing the whole prompt.
+        
+        This holds for byte-level BPE tokenizers (GPT-2, DialoGPT) but not for
+        SentencePiece ones such as Llama's, which add a dummy-prefix space to
+        the start of every separately tokenized string.
+        
+        Returns:
+            True if prompts can reuse the cached instruction block ids
+        """
+        sample = "Source 1 (Paper: 0000.00000, Section: Introduction):\n"
+        whole_ids = self.tokenizer(STATIC_INSTRUCTIONS + sample).input_ids
+        tail_ids = self.tokenizer(sample, add_special_tokens=False).input_ids
+        if whole_ids == self._prefix_ids[0].tolist() + tail_ids:
+            return True
+        logger.info("Tokenizer does not split prompts cleanly, tokenizing whole prompts")
+        return False
+    
+    def _encode_prefix(self):
+        """
+        Run the instruction block through the model once and keep its KV cache.
+        
+        Single-prompt generation starts from this cache, so prefill only runs
+        over the context and question.
+        
+        Returns:
+            past_key_values for the instruction block, or None if the model
+            could not produce them
+        """
+        try:
+            with torch.no_grad():
+                outputs = self.model(input_ids=self._prefix_ids.to(self.model.device), use_cache=True)
+            return outputs.past_key_values
+        except Exception as e:
+            logger.warning(f"Could not cache prompt prefix, prefilling it on every call: {str(e)}")
+            return None
+    
+    def _load_vllm(self, model_name: str):
+        """
+        Load the model into a vLLM engine.
+        
+        The engine keeps the KV cache in pages shared across calls, and prefix
+        caching lets prompts that start with the same instruction block reuse
+        its KV entries instead of recomputing them.
+        
+        Args:
+            model_name: Name of the language model to use
+        """
+        from vllm import LLM
+        
+        self.model = None
+        self.llm = LLM(model=model_name, dtype="bfloat16", enable_prefix_caching=True,
+                       trust_remote_code=True)
+        self.tokenizer = self.llm.get_tokenizer()
+        
+        logger.info(f"Model loaded successfully with vLLM")
+    
     def generate_answer(self, query: str, context_chunks: List[Dict[str, Any]]) -> str:
         """
         Generate an answer based on the query and retrieved context.
@@ -87,6 +288,28 @@ class RAGGenerator:
             logger.error(f"Error generating answer: {str(e)}")
             return f"Error generating answer: {str(e)}"
     
+    def generate_answers(self, queries: List[str], contexts: List[List[Dict[str, Any]]]) -> List[str]:
+        """
+        Generate answers for several queries in one batched generation.
+        
+        Args:
+            queries: User questions
+            contexts: Retrieved context chunks for each question
+            
+        Returns:
+            Generated answers, in the order of queries
+        """
+        try:
+            prompts = [
+                self._construct_prompt(query, context_chunks)
+                for query, context_chunks in zip(queries, contexts)
+            ]
+            return self._generate_texts(prompts)
+            
+        except Exception as e:
+            logger.error(f"Error generating answers: {str(e)}")
+            return [f"Error generating answer: {str(e)}"] * len(queries)
+    
     def _construct_prompt(self, query: str, context_chunks: List[Dict[str, Any]]) -> str:
         """
         Construct a detailed prompt for the LLM.
@@ -108,18 +331,7 @@ class RAGGenerator:
             context_text += f"Source {i} (Paper: {source_id}, Section: {section}):\n{content}\n\n"
         
         # Construct the prompt
-        prompt = f"""You are an expert scientific researcher and educator. Your task is to answer questions about scientific literature based ONLY on the provided context. 
-
-IMPORTANT INSTRUCTIONS:
-1. Answer the question using ONLY the information provided in the context
-2. If the context doesn't contain enough information to answer the question, say so clearly
-3. Cite your sources using the format [Source X] where X is the source number
-4. Be precise, accurate, and scientific in your response
-5. If you mention specific findings, methods, or results, always cite the source
-6. Use clear, academic language appropriate for scientific communication
-
-CONTEXT:
-{context_text}
+        prompt = STATIC_INSTRUCTIONS + f"""{context_text}
 
 QUESTION: {query}
 
@@ -138,20 +350,55 @@ ANSWER:"""
         Returns:
             Generated text
         """
+        return self._generate_texts([prompt], max_length)[0]
+    
+    def _generate_texts(self, prompts: List[str], max_length: int = 2048) -> List[str]:
+        """
+        Generate text for several prompts with a single generate call.
+        
+        Prompts are left-padded to a common length so every sequence ends at
+        the same position and generation continues directly after it.
+        
+        Args:
+            prompts: Input prompts
+            max_length: Maximum length of each prompt in tokens
+            
+        Returns:
+            Generated text for each prompt, in order
+        """
         try:
-            # Tokenize input
-            inputs = self.tokenizer(
-                prompt,
-                return_tensors="pt",
-                truncation=True,
-                max_length=max_length
-            )
+            if self.backend == "vllm":
+                from vllm import SamplingParams
+                
+                outputs = self.llm.generate(
+                    prompts,
+                    SamplingParams(temperature=0.7, max_tokens=512),
+                    use_tqdm=False
+                )
+                return [output.outputs[0].text.strip() for output in outputs]
+            
+            # Tokenize input and left-pad to the longest prompt
+            encoded = [self._tokenize_prompt(prompt, max_length)["input_ids"][0] for prompt in prompts]
+            input_length = max(len(ids) for ids in encoded)
+            input_ids = torch.full((len(encoded), input_length), self.tokenizer.pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(encoded), input_length), dtype=torch.long)
+            for row, ids in enumerate(encoded):
+                input_ids[row, input_length - len(ids):] = ids
+                attention_mask[row, input_length - len(ids):] = 1
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
             
             # Move to device
             if self.device == "cuda":
                 inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
-            # Generate response
+            # A single prompt starting with the instruction block can resume from
+            # its cached KV; generate extends the cache in place, so use a copy
+            prefix_length = self._prefix_ids.shape[1]
+            if (len(prompts) == 1 and self._prefix_kv is not None and input_length > prefix_length
+                    and torch.equal(input_ids[0, :prefix_length], self._prefix_ids[0])):
+                inputs["past_key_values"] = copy.deepcopy(self._prefix_kv)
+            
+            # Generate responses
             with torch.no_grad():
                 outputs = self.model.generate(
                     **inputs,
@@ -162,17 +409,47 @@ ANSWER:"""
                     eos_token_id=self.tokenizer.eos_token_id
                 )
             
-            # Decode response
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            
-            # Extract only the generated part (after the prompt)
-            response = response[len(prompt):].strip()
+            # Decode only the generated tokens (after the prompt)
+            responses = self.tokenizer.batch_decode(outputs[:, input_length:], skip_special_tokens=True)
             
-            return response
+            return [response.strip() for response in responses]
             
         except Exception as e:
             logger.error(f"Error in text generation: {str(e)}")
-            return f"Error generating response: {str(e)}"
+            return [f"Error generating response: {str(e)}"] * len(prompts)
+    
+    def _tokenize_prompt(self, prompt: str, max_length: int) -> Dict[str, torch.Tensor]:
+        """
+        Tokenize a prompt, reusing the cached ids of the instruction block.
+        
+        Prompts are tokenized whole if the tokenizer failed the split check.
+        
+        Args:
+            prompt: Input prompt
+            max_length: Maximum number of prompt tokens
+            
+        Returns:
+            Dictionary with input_ids and attention_mask tensors
+        """
+        if not (self._split_tokenization and prompt.startswith(STATIC_INSTRUCTIONS)):
+            return self.tokenizer(
+                prompt,
+                return_tensors="pt",
+                truncation=True,
+                max_length=max_length
+            )
+        
+        prefix_ids = self._prefix_ids
+        tail_ids = self.tokenizer(
+            prompt[len(STATIC_INSTRUCTIONS):],
+            return_tensors="pt",
+            add_special_tokens=False,
+            truncation=True,
+            max_length=max(max_length - prefix_ids.shape[1], 1)
+        ).input_ids
+        
+        input_ids = torch.cat([prefix_ids, tail_ids], dim=1)
+        return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
     
     def get_model_info(self) -> dict:
         """
@@ -184,6 +461,7 @@ ANSWER:"""
         return {
             "model_name": self.model_name,
             "device": self.device,
+            "backend": self.backend,
             "vocab_size": self.tokenizer.vocab_size,
             "max_length": self.tokenizer.model_max_length
         }
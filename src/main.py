@@ -7,6 +7,7 @@ to system setup and testing.
 
 import logging
 import argparse
+from functools import cached_property
 from pathlib import Path
 import sys
 
@@ -15,8 +16,9 @@ sys.path.append(str(Path(__file__).parent))
 
 from data_processing.downloader import ArxivDownloader
 from data_processing.parser import ScientificPDFParser
-from data_processing.chunker import ScientificChunker
-from retrieval.embedder import SentenceTransformerEmbedder
+from data_processing.chunker import Chunk, ScientificChunker
+from data_processing.indexer import batched, bulk_index
+from retrieval.embedder import SentenceTransformerEmbedder, get_embedder
 from retrieval.vector_store import ChromaVectorStore
 from generation.llm import RAGGenerator
 
@@ -30,22 +32,46 @@ logger = logging.getLogger(__name__)
 class ScientificRAGPipeline:
     """Main pipeline for the Scientific RAG system."""
     
-    def __init__(self):
-        """Initialize the pipeline components."""
-        self.downloader = ArxivDownloader()
-        self.parser = ScientificPDFParser()
-        self.chunker = ScientificChunker()
-        self.embedder = SentenceTransformerEmbedder()
-        self.vector_store = ChromaVectorStore()
-        self.generator = RAGGenerator()
+    # Components are created on first access, so e.g. --stats never loads the LLM
     
-    def run_full_pipeline(self, category: str = "q-bio.NC", max_papers: int = 100):
+    @cached_property
+    def downloader(self) -> ArxivDownloader:
+        """arXiv paper downloader."""
+        return ArxivDownloader()
+    
+    @cached_property
+    def parser(self) -> ScientificPDFParser:
+        """PDF parser."""
+        return ScientificPDFParser()
+    
+    @cached_property
+    def chunker(self) -> ScientificChunker:
+        """Paper chunker."""
+        return ScientificChunker()
+    
+    @cached_property
+    def embedder(self) -> SentenceTransformerEmbedder:
+        """Sentence embedding model."""
+        return get_embedder()
+    
+    @cached_property
+    def vector_store(self) -> ChromaVectorStore:
+        """ChromaDB vector store."""
+        return ChromaVectorStore()
+    
+    @cached_property
+    def generator(self) -> RAGGenerator:
+        """Answer generation model."""
+        return RAGGenerator()
+    
+    def run_full_pipeline(self, category: str = "q-bio.NC", max_papers: int = 100, workers: int = None):
         """
         Run the complete RAG pipeline.
         
         Args:
             category: arXiv category to download papers from
             max_papers: Maximum number of papers to process
+            workers: Number of worker processes for PDF parsing (None for one per CPU)
         """
         logger.info("Starting Scientific RAG Pipeline")
         
@@ -59,27 +85,30 @@ class ScientificRAGPipeline:
         
         # Step 2: Parse PDFs
         logger.info("Step 2: Parsing PDFs")
-        parsed_papers = self.parser.parse_all_pdfs()
+        parsed_papers = self.parser.parse_all_pdfs(workers=workers)
         
         if not parsed_papers:
             logger.warning("No papers parsed. Exiting pipeline.")
             return False
         
-        # Step 3: Chunk papers
+        # Steps 3 and 4: Chunk papers and build vector index
+        # Chunks are streamed from the chunker straight into the indexer
         logger.info("Step 3: Chunking papers")
-        all_chunks = self.chunker.chunk_all_papers()
-        
-        if not all_chunks:
-            logger.warning("No chunks created. Exiting pipeline.")
-            return False
-        
-        # Step 4: Build vector index
         logger.info("Step 4: Building vector index")
-        success = self.vector_store.build_index(all_chunks, self.embedder)
+        chunks = self.chunker.chunk_all_papers()
+        indexed_count = bulk_index(batched(chunks), self.vector_store, self.embedder)
         
-        if not success:
-            logger.error("Failed to build vector index. Exiting pipeline.")
-            return False
+        # Remove chunks of changed or removed papers that were not produced again
+        stale_ids = self.chunker.pop_stale_chunk_ids()
+        if stale_ids:
+            self.vector_store.collection.delete(ids=stale_ids)
+        
+        if indexed_count == 0:
+            # Chunking is incremental, so an unchanged corpus yields no new chunks
+            if self.vector_store.get_collection_info().get("count", 0) == 0:
+                logger.warning("No chunks created. Exiting pipeline.")
+                return False
+            logger.info("No new chunks to index, using existing vector index")
         
         # Step 5: Test the system
         logger.info("Step 5: Testing the system")
@@ -98,22 +127,28 @@ class ScientificRAGPipeline:
         
         logger.info("Testing system with sample queries...")
         
-        for query in test_queries:
+        # Retrieve context for every query in one batch, then generate all answers at once
+        queries = []
+        contexts = []
+        try:
+            batch_results = self.vector_store.query_batch(test_queries, n_results=3, embedder=self.embedder)
+        except Exception as e:
+            logger.error(f"Error testing queries: {str(e)}")
+            batch_results = []
+        
+        for query, context_chunks in zip(test_queries, batch_results):
             logger.info(f"Testing query: {query}")
             
-            try:
-                # Retrieve context
-                context_chunks = self.vector_store.query(query, n_results=3)
-                
-                if context_chunks:
-                    # Generate answer
-                    answer = self.generator.generate_answer(query, context_chunks)
-                    logger.info(f"Generated answer: {answer[:100]}...")
-                else:
-                    logger.warning("No context found for query")
-                    
-            except Exception as e:
-                logger.error(f"Error testing query '{query}': {str(e)}")
+            if context_chunks:
+                queries.append(query)
+                contexts.append(context_chunks)
+            else:
+                logger.warning("No context found for query")
+        
+        if queries:
+            answers = self.generator.generate_answers(queries, contexts)
+            for query, answer in zip(queries, answers):
+                logger.info(f"Generated answer for '{query}': {answer[:100]}...")
     
     def get_system_stats(self):
         """Get statistics about the system."""
@@ -126,12 +161,16 @@ class ScientificRAGPipeline:
         # Chunk stats
         chunks = self.vector_store.load_chunks_from_file()
         if chunks:
-            chunk_stats = self.chunker.get_chunk_statistics(chunks)
+            chunk_stats = self.chunker.get_chunk_statistics([Chunk.from_dict(c) for c in chunks])
             stats['chunks'] = chunk_stats
         
         # Model info
         stats['embedder'] = self.embedder.get_model_info()
-        stats['generator'] = self.generator.get_model_info()
+        # Only report the generator if it is loaded; loading it just for stats is expensive
+        if 'generator' in self.__dict__:
+            stats['generator'] = self.generator.get_model_info()
+        else:
+            stats['generator'] = {"loaded": False}
         
         return stats
 
@@ -149,6 +188,12 @@ def main():
         default=100, 
         help="Maximum number of papers to process"
     )
+    parser.add_argument(
+        "--workers", 
+        type=int, 
+        default=None, 
+        help="Number of worker processes for PDF parsing (default: one per CPU)"
+    )
     parser.add_argument(
         "--test-only", 
         action="store_true", 
@@ -183,7 +228,8 @@ def main():
     # Run full pipeline
     success = pipeline.run_full_pipeline(
         category=args.category,
-        max_papers=args.max_papers
+        max_papers=args.max_papers,
+        workers=args.workers
     )
     
     if success:
@@ -5,26 +5,55 @@ This module provides embedding functionality for scientific documents using
 sentence transformers.
 """
 
+import functools
+import hashlib
 import logging
-from typing import List, Union
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Union
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import torch
+import torch.nn.functional as F
+from tqdm import tqdm
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Local copies of downloaded models, so later loads skip the Hugging Face Hub
+LOCAL_MODEL_DIR = "models"
+
+def _text_key(text: str) -> bytes:
+    """Return the 16-byte content hash used as the embedding cache key."""
+    return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
 class SentenceTransformerEmbedder:
     """Embedder using Sentence Transformers for scientific documents."""
     
-    def __init__(self, model_name: str = "BAAI/bge-large-en-v1.5", device: str = None):
+    def __init__(self, model_name: str = "BAAI/bge-large-en-v1.5", device: str = None, fp16: bool = True,
+                 max_seq_length: Optional[int] = None, int8_cpu: bool = False,
+                 cache_dir: Optional[str] = None, local_model_dir: Optional[str] = None):
         """
         Initialize the embedder.
         
         Args:
             model_name: Name of the sentence transformer model to use
             device: Device to run the model on ('cpu', 'cuda', or None for auto)
+            fp16: Run the model in half precision when on CUDA (ignored on CPU,
+                where FP16 is slower than FP32)
+            max_seq_length: Truncate inputs to this many tokens (None keeps the
+                model's default); attention cost grows quadratically with it
+            int8_cpu: Dynamically quantize the Linear layers to INT8 when on CPU.
+                Embeddings shift slightly, so index and queries should use the
+                same setting
+            cache_dir: Directory for an on-disk embedding cache keyed by text
+                hash (None disables caching)
+            local_model_dir: Directory for a local copy of the model. The model
+                is saved there on first load and loaded from there afterwards
+                (None always loads model_name directly)
         """
         self.model_name = model_name
         
@@ -36,45 +65,272 @@ class SentenceTransformerEmbedder:
         logger.info(f"Loading model {model_name} on device {device}")
         
         try:
-            self.model = SentenceTransformer(model_name, device=device)
+            local_path = None
+            if local_model_dir is not None and not Path(model_name).is_dir():
+                local_path = Path(local_model_dir) / model_name.replace("/", "__")
+            
+            if local_path is not None and (local_path / "modules.json").exists():
+                self.model = SentenceTransformer(str(local_path), device=device)
+            else:
+                self.model = SentenceTransformer(model_name, device=device)
+                if local_path is not None:
+                    self._save_local_copy(local_path)
+            
+            if fp16 and device == "cuda":
+                self.model.half()
+            elif int8_cpu and device == "cpu":
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            if max_seq_length is not None:
+                self.model.max_seq_length = max_seq_length
             logger.info(f"Model loaded successfully")
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise
+        
+        # Cached embeddings are only valid for the same model and settings
+        if fp16 and device == "cuda":
+            precision = "fp16"
+        elif int8_cpu and device == "cpu":
+            precision = "int8"
+        else:
+            precision = "fp32"
+        self._cache_tag = f"{model_name}|{self.model.max_seq_length}|{precision}"
+        
+        # Returned for empty or whitespace-only texts instead of running the model
+        self._zero_vec = np.zeros(self.model.get_sentence_embedding_dimension(), dtype=np.float32)
+        self._zero_vec.setflags(write=False)
+        
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._cache: Optional[Dict[bytes, np.ndarray]] = None
+        if self.cache_dir is not None:
+            self._cache = self._load_cache()
+    
+    def _save_local_copy(self, local_path: Path):
+        """
+        Save the freshly loaded model to local_path for later loads.
+        
+        Args:
+            local_path: Directory to save the model to
+        """
+        tmp_path = local_path.with_name(local_path.name + ".tmp")
+        try:
+            self.model.save(str(tmp_path))
+            os.replace(tmp_path, local_path)
+            logger.info(f"Saved local copy of {self.model_name} to {local_path}")
+        except OSError as e:
+            logger.warning(f"Could not save local model copy: {str(e)}")
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None,
+                        show_progress_bar: bool = True) -> np.ndarray:
         """
         Embed a list of text documents.
         
+        SentenceTransformer.encode sorts the texts by length before batching
+        (and restores the input order afterwards), so each batch is only
+        padded to the length of similar texts.
+        
         Args:
             texts: List of text strings to embed
+            batch_size: Texts per forward pass (None for 64 on CUDA, 32 on CPU)
+            show_progress_bar: Show a progress bar while encoding
             
         Returns:
-            List of embedding vectors
+            Float32 array of shape (len(texts), dimension) holding
+            L2-normalized embeddings (all zeros for empty or whitespace-only texts)
         """
         if not texts:
-            return []
+            return np.empty((0, self._zero_vec.shape[0]), dtype=np.float32)
+        
+        # Embed only the non-blank texts and scatter them back
+        non_blank = [i for i, text in enumerate(texts) if text.strip()]
+        if len(non_blank) < len(texts):
+            embeddings = np.zeros((len(texts), self._zero_vec.shape[0]), dtype=np.float32)
+            if non_blank:
+                embeddings[non_blank] = self.embed_documents(
+                    [texts[i] for i in non_blank], batch_size, show_progress_bar
+                )
+            return embeddings
+        
+        if batch_size is None:
+            batch_size = 64 if self.device == "cuda" else 32
+        
+        if self._cache is None:
+            return self._encode(texts, batch_size, show_progress_bar)
+        
+        # Encode only texts not already in the cache (each distinct text once)
+        keys = [_text_key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._cache:
+                missing.setdefault(key, text)
+        
+        if missing:
+            embeddings = self._encode(list(missing.values()), batch_size, show_progress_bar)
+            self._add_to_cache(list(missing), embeddings)
+        
+        logger.debug("Embedding cache hits: %d of %d", len(texts) - len(missing), len(texts))
+        return np.stack([self._cache[key] for key in keys])
+    
+    def _encode(self, texts: List[str], batch_size: int, show_progress_bar: bool) -> np.ndarray:
+        """
+        Run the model over texts.
         
+        Args:
+            texts: List of text strings to embed
+            batch_size: Texts per forward pass
+            show_progress_bar: Show a progress bar while encoding
+            
+        Returns:
+            Float32 array of L2-normalized embeddings
+        """
         try:
-            # Encode texts to embeddings
-            embeddings = self.model.encode(
-                texts,
-                convert_to_numpy=True,
-                show_progress_bar=True,
-                batch_size=32
-            )
+            if self.device == "cuda":
+                embeddings = self._encode_pipelined(texts, batch_size, show_progress_bar)
+                logger.debug("Embedded %d documents", len(texts))
+                return embeddings
             
-            # Convert to list of lists
-            embeddings_list = embeddings.tolist()
+            # Encode texts to embeddings
+            with torch.inference_mode():
+                embeddings = self.model.encode(
+                    texts,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=show_progress_bar,
+                    batch_size=batch_size
+                )
             
-            logger.info(f"Embedded {len(texts)} documents")
-            return embeddings_list
+            logger.debug("Embedded %d documents", len(texts))
+            return embeddings.astype(np.float32, copy=False)
             
         except Exception as e:
             logger.error(f"Error embedding documents: {str(e)}")
             raise
     
-    def embed_single_document(self, text: str) -> List[float]:
+    def _encode_pipelined(self, texts: List[str], batch_size: int, show_progress_bar: bool) -> np.ndarray:
+        """
+        Run the model over texts, tokenizing the next batch while the current one runs.
+        
+        Like SentenceTransformer.encode, texts are sorted by length before
+        batching and the embeddings are returned in input order. The fast
+        tokenizer releases the GIL, so a worker thread can tokenize (and pin
+        the host memory of) batch i+1 while the GPU computes batch i.
+        
+        Args:
+            texts: List of text strings to embed
+            batch_size: Texts per forward pass
+            show_progress_bar: Show a progress bar while encoding
+            
+        Returns:
+            Float32 array of L2-normalized embeddings
+        """
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        batches = [order[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+        pin_memory = self.device == "cuda"
+        
+        def tokenize(indices: np.ndarray) -> Dict[str, torch.Tensor]:
+            features = self.model.tokenize([texts[i] for i in indices])
+            if pin_memory:
+                features = {k: v.pin_memory() if torch.is_tensor(v) else v for k, v in features.items()}
+            return features
+        
+        embeddings = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        with ThreadPoolExecutor(max_workers=1) as tokenizer_pool, torch.inference_mode():
+            next_features = tokenizer_pool.submit(tokenize, batches[0])
+            for batch_idx in tqdm(range(len(batches)), desc="Batches", disable=not show_progress_bar):
+                features = next_features.result()
+                if batch_idx + 1 < len(batches):
+                    next_features = tokenizer_pool.submit(tokenize, batches[batch_idx + 1])
+                
+                features = {
+                    k: v.to(self.device, non_blocking=True) if torch.is_tensor(v) else v
+                    for k, v in features.items()
+                }
+                batch_embeddings = F.normalize(self.model(features)["sentence_embedding"], p=2, dim=1)
+                embeddings[batches[batch_idx]] = batch_embeddings.float().cpu().numpy()
+        
+        return embeddings
+    
+    def _load_cache(self) -> Dict[bytes, np.ndarray]:
+        """
+        Load all cache shards written for this model and settings.
+        
+        Returns:
+            Dictionary mapping text hash to embedding
+        """
+        cache = {}
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for shard_file in sorted(self.cache_dir.glob("*.npz")):
+            try:
+                with np.load(shard_file) as shard:
+                    if str(shard["tag"]) != self._cache_tag:
+                        continue
+                    cache.update(zip((key.tobytes() for key in shard["keys"]), shard["embeddings"]))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable embedding cache shard {shard_file}: {str(e)}")
+        logger.info(f"Loaded {len(cache)} cached embeddings from {self.cache_dir}")
+        return cache
+    
+    def _add_to_cache(self, keys: List[bytes], embeddings: np.ndarray):
+        """
+        Add new embeddings to the cache and persist them as a new shard.
+        
+        Each call writes only its own entries, so saving stays proportional
+        to the number of newly embedded texts.
+        
+        Args:
+            keys: Text hashes
+            embeddings: Embeddings aligned with keys
+        """
+        self._cache.update(zip(keys, embeddings))
+        
+        shard_file = self.cache_dir / f"{time.time_ns()}_{os.getpid()}.npz"
+        tmp_file = shard_file.with_name(shard_file.name + ".tmp")
+        try:
+            with open(tmp_file, 'wb') as f:
+                np.savez(
+                    f,
+                    keys=np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(len(keys), -1),
+                    embeddings=embeddings,
+                    tag=np.array(self._cache_tag)
+                )
+            os.replace(tmp_file, shard_file)
+        except OSError as e:
+            logger.warning(f"Could not persist embedding cache: {str(e)}")
+    
+    def embed_query(self, text: str) -> np.ndarray:
+        """
+        Embed a single query text.
+        
+        The text is passed to the model directly rather than as a one-item
+        list, and the embedding cache is bypassed.
+        
+        Args:
+            text: Query text to embed
+            
+        Returns:
+            Float32 array of shape (dimension,) holding the L2-normalized
+            embedding, or a read-only zero vector for empty or whitespace-only text
+        """
+        if not text or not text.strip():
+            return self._zero_vec
+        
+        try:
+            with torch.inference_mode():
+                embedding = self.model.encode(
+                    text,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
+            return embedding.astype(np.float32, copy=False)
+            
+        except Exception as e:
+            logger.error(f"Error embedding query: {str(e)}")
+            raise
+    
+    def embed_single_document(self, text: str) -> np.ndarray:
         """
         Embed a single text document.
         
@@ -84,28 +340,53 @@ class SentenceTransformerEmbedder:
         Returns:
             Embedding vector
         """
-        embeddings = self.embed_documents([text])
-        return embeddings[0] if embeddings else []
+        return self.embed_query(text)
+    
+    def compute_similarities(self, queries: Union[np.ndarray, List[List[float]]],
+                             documents: Union[np.ndarray, List[List[float]]],
+                             normalized: bool = False) -> np.ndarray:
+        """
+        Compute cosine similarities between every query and every document.
+        
+        Rows are normalized once, so the similarities are a single matrix
+        product.
+        
+        Args:
+            queries: Query embeddings of shape (n_queries, dimension)
+            documents: Document embeddings of shape (n_documents, dimension)
+            normalized: Rows are already unit length, as returned by
+                embed_documents and embed_query, so the normalization is skipped
+            
+        Returns:
+            Float32 array of shape (n_queries, n_documents)
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        documents = np.asarray(documents, dtype=np.float32)
+        if not normalized:
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+            documents = documents / np.linalg.norm(documents, axis=1, keepdims=True)
+        return queries @ documents.T
     
-    def compute_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
+    def compute_similarity(self, embedding1: Union[np.ndarray, List[float]],
+                           embedding2: Union[np.ndarray, List[float]],
+                           normalized: bool = False) -> float:
         """
         Compute cosine similarity between two embeddings.
         
         Args:
             embedding1: First embedding vector
             embedding2: Second embedding vector
+            normalized: Both vectors are already unit length, so the cosine
+                similarity is their dot product
             
         Returns:
             Cosine similarity score
         """
         try:
-            # Convert to numpy arrays
-            vec1 = np.array(embedding1)
-            vec2 = np.array(embedding2)
-            
-            # Compute cosine similarity
-            similarity = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
-            return float(similarity)
+            if normalized:
+                return float(np.dot(embedding1, embedding2))
+            similarities = self.compute_similarities(np.atleast_2d(embedding1), np.atleast_2d(embedding2))
+            return float(similarities[0, 0])
             
         except Exception as e:
             logger.error(f"Error computing similarity: {str(e)}")
@@ -125,9 +406,26 @@ class SentenceTransformerEmbedder:
             "embedding_dimension": self.model.get_sentence_embedding_dimension()
         }
 
+@functools.lru_cache(maxsize=4)
+def get_embedder(model_name: str = "BAAI/bge-large-en-v1.5", device: str = None) -> SentenceTransformerEmbedder:
+    """
+    Get a shared embedder, loading it on the first call.
+    
+    Repeated calls with the same arguments return the same instance, and
+    the model is loaded from a local copy in LOCAL_MODEL_DIR when one exists.
+    
+    Args:
+        model_name: Name of the sentence transformer model to use
+        device: Device to run the model on ('cpu', 'cuda', or None for auto)
+        
+    Returns:
+        Shared SentenceTransformerEmbedder instance
+    """
+    return SentenceTransformerEmbedder(model_name=model_name, device=device, local_model_dir=LOCAL_MODEL_DIR)
+
 def main():
     """Test the embedder with sample texts."""
-    embedder = SentenceTransformerEmbedder()
+    embedder = get_embedder()
     
     # Sample scientific texts
     sample_texts = [
@@ -141,11 +439,11 @@ def main():
     
     print(f"Model Info: {embedder.get_model_info()}")
     print(f"Embedded {len(embeddings)} texts")
-    print(f"Embedding dimension: {len(embeddings[0]) if embeddings else 0}")
+    print(f"Embedding dimension: {embeddings.shape[1]}")
     
     # Test similarity
     if len(embeddings) >= 2:
-        similarity = embedder.compute_similarity(embeddings[0], embeddings[1])
+        similarity = embedder.compute_similarity(embeddings[0], embeddings[1], normalized=True)
         print(f"Similarity between first two texts: {similarity:.4f}")
 
 if __name__ == "__main__":
@@ -0,0 +1,530 @@
+"""
+FAISS Vector Store for Scientific Documents
+
+This module provides an alternative to the ChromaDB vector store that keeps
+the embeddings in a FAISS HNSW index, whose distance kernels are SIMD
+optimized, and the documents in a JSON Lines sidecar file.
+"""
+
+import logging
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set
+import faiss
+import numpy as np
+import orjson
+from pathlib import Path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.faiss"
+DOCUMENTS_FILENAME = "documents.jsonl"
+
+class FaissVectorStore:
+    """Vector store using a FAISS HNSW index for scientific document retrieval."""
+    
+    def __init__(self, persist_directory: str = "./faiss_db", M: int = 32,
+                 ef_construction: int = 200, ef_search: int = 64, fp16: bool = True):
+        """
+        Initialize the vector store, loading a persisted index if present.
+        
+        Args:
+            persist_directory: Directory to persist the index and documents
+            M: Number of HNSW graph neighbours per node
+            ef_construction: HNSW beam width while building the graph
+            ef_search: HNSW beam width while searching
+            fp16: Store vectors as float16, halving index memory and the bytes
+                read per distance computation. Only affects newly created
+                indexes; a persisted index keeps the storage it was built with
+        """
+        self.persist_directory = Path(persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.fp16 = fp16
+        
+        self.index: Optional[faiss.Index] = None
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.ids: List[str] = []
+        self._id_set: Set[str] = set()
+        
+        index_file = self.persist_directory / INDEX_FILENAME
+        documents_file = self.persist_directory / DOCUMENTS_FILENAME
+        if index_file.exists() and documents_file.exists():
+            self.index = faiss.read_index(str(index_file))
+            self._configure_search()
+            with open(documents_file, 'rb') as f:
+                for line in f:
+                    record = orjson.loads(line)
+                    self.ids.append(record["id"])
+                    self.documents.append(record["text_content"])
+                    self.metadatas.append(record["metadata"])
+            self._id_set.update(self.ids)
+            logger.info(f"Loaded FAISS index with {self.index.ntotal} vectors from {self.persist_directory}")
+    
+    def _create_index(self, dimension: int) -> faiss.Index:
+        """
+        Create an empty HNSW index.
+        
+        Embeddings are L2-normalized, so inner product equals cosine similarity;
+        rounding unit vectors to float16 barely changes the ranking.
+        
+        Args:
+            dimension: Embedding dimension
+        
+        Returns:
+            Empty FAISS index
+        """
+        if self.fp16:
+            index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_fp16, self.M,
+                                      faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, self.M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = self.ef_construction
+        index.hnsw.efSearch = self.ef_search
+        return index
+    
+    def build_index(self, chunks: Iterable[Dict[str, Any]], embedder, batch_size: int = 1024) -> bool:
+        """
+        Build the vector index from chunks.
+        
+        Chunks are embedded and added batch by batch; the index is written
+        to disk once all batches have been added. Documents are keyed by the
+        chunk ID in their metadata. FAISS graph indexes cannot remove vectors,
+        so chunks whose ID is already indexed are skipped; use
+        clear_collection to rebuild with changed chunks.
+        
+        Args:
+            chunks: Iterable of chunk dictionaries with text_content and metadata
+            embedder: Embedder instance to generate embeddings
+            batch_size: Number of chunks to embed and add at a time
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        offset = len(self.ids)
+        skipped = 0
+        try:
+            chunks = iter(chunks)
+            while True:
+                batch = list(islice(chunks, batch_size))
+                if not batch:
+                    break
+                
+                # Key by chunk ID, skipping chunks that are already indexed
+                start = len(self.ids)
+                ids = []
+                new_chunks = []
+                batch_ids = set()
+                for chunk in batch:
+                    doc_id = chunk["metadata"].get("chunk_id") or f"chunk_{start + len(ids)}"
+                    if doc_id in self._id_set or doc_id in batch_ids:
+                        continue
+                    batch_ids.add(doc_id)
+                    ids.append(doc_id)
+                    new_chunks.append(chunk)
+                skipped += len(batch) - len(new_chunks)
+                if not new_chunks:
+                    continue
+                
+                # Extract text content and metadata
+                texts = [chunk["text_content"] for chunk in new_chunks]
+                metadatas = [chunk["metadata"] for chunk in new_chunks]
+                
+                # Generate embeddings
+                logger.info(f"Generating embeddings for {len(texts)} chunks...")
+                embeddings = np.ascontiguousarray(embedder.embed_documents(texts), dtype=np.float32)
+                
+                self._add_embeddings(embeddings)
+                
+                self.ids.extend(ids)
+                self._id_set.update(ids)
+                self.documents.extend(texts)
+                self.metadatas.extend(metadatas)
+            
+            self._flush()
+            indexed = len(self.ids) - offset
+            if skipped:
+                logger.info(f"Skipped {skipped} chunks that are already indexed")
+            if indexed == 0:
+                if skipped:
+                    return True
+                logger.warning("No chunks provided for indexing")
+                return False
+            
+            self._persist(self.ids[offset:], self.documents[offset:], self.metadatas[offset:])
+            
+            logger.info(f"Successfully indexed {indexed} chunks")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error building index: {str(e)}")
+            # Keep only the documents whose vectors made it into the index, and
+            # keep the files in sync with them
+            added = self.index.ntotal if self.index is not None else 0
+            del self.ids[added:], self.documents[added:], self.metadatas[added:]
+            self._id_set = set(self.ids)
+            if added > offset:
+                self._persist(self.ids[offset:], self.documents[offset:], self.metadatas[offset:])
+            return False
+    
+    def _add_embeddings(self, embeddings: np.ndarray):
+        """
+        Add a batch of embeddings to the index, creating it on first use.
+        
+        Args:
+            embeddings: Float32 array of shape (n, dimension)
+        """
+        if self.index is None:
+            self.index = self._create_index(embeddings.shape[1])
+        self.index.add(embeddings)
+    
+    def _flush(self):
+        """Add any embeddings held back by _add_embeddings; called after the last batch."""
+    
+    def _configure_search(self):
+        """Apply the search settings to an index loaded from disk."""
+        self.set_search_ef(self.ef_search)
+    
+    def _persist(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]):
+        """
+        Save the index and append newly added documents to the sidecar file.
+        
+        Args:
+            ids: IDs of the newly added documents
+            texts: Newly added document texts
+            metadatas: Newly added document metadata
+        """
+        faiss.write_index(self.index, str(self.persist_directory / INDEX_FILENAME))
+        with open(self.persist_directory / DOCUMENTS_FILENAME, 'ab') as f:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                f.write(orjson.dumps({"id": doc_id, "text_content": text, "metadata": metadata}))
+                f.write(b"\n")
+    
+    def set_search_ef(self, ef: int) -> bool:
+        """
+        Set the HNSW search beam width (ef) used by subsequent queries.
+        
+        Args:
+            ef: Search beam width
+        
+        Returns:
+            True if the setting was applied, False otherwise
+        """
+        self.ef_search = ef
+        if self.index is None:
+            return True
+        try:
+            self.index.hnsw.efSearch = ef
+            return True
+        except AttributeError as e:
+            logger.warning(f"Could not set search ef: {str(e)}")
+            return False
+    
+    def query(self, query_text: str, n_results: int = 5, embedder=None) -> List[Dict[str, Any]]:
+        """
+        Query the vector store for similar documents.
+        
+        Args:
+            query_text: Query text to search for
+            n_results: Number of results to return
+            embedder: Embedder instance to generate query embeddings
+        
+        Returns:
+            List of dictionaries containing similar documents with metadata.
+            The distance is 1 - inner product, as in the ChromaDB "ip" space.
+        """
+        if embedder is None:
+            logger.error("FaissVectorStore.query requires an embedder")
+            return []
+        if self.index is None or self.index.ntotal == 0:
+            logger.warning("Query on empty index")
+            return []
+        
+        try:
+            query_embedding = embedder.embed_query(query_text).reshape(1, -1)
+            scores, indices = self.index.search(query_embedding, n_results)
+            formatted_results = self._format_results(scores[0], indices[0])
+            
+            logger.info(f"Query returned {len(formatted_results)} results")
+            return formatted_results
+        
+        except Exception as e:
+            logger.error(f"Error querying vector store: {str(e)}")
+            return []
+    
+    def query_batch(self, queries: List[str], n_results: int = 5, embedder=None) -> List[List[Dict[str, Any]]]:
+        """
+        Query the vector store for several queries at once.
+        
+        Args:
+            queries: Query texts to search for
+            n_results: Number of results to return per query
+            embedder: Embedder instance to generate query embeddings
+        
+        Returns:
+            One list of result dictionaries per query, in the order of queries
+        """
+        if not queries:
+            return []
+        if embedder is None:
+            logger.error("FaissVectorStore.query_batch requires an embedder")
+            return [[] for _ in queries]
+        if self.index is None or self.index.ntotal == 0:
+            logger.warning("Query on empty index")
+            return [[] for _ in queries]
+        
+        try:
+            query_embeddings = np.ascontiguousarray(
+                embedder.embed_documents(queries, show_progress_bar=False), dtype=np.float32
+            )
+            scores, indices = self.index.search(query_embeddings, n_results)
+            formatted_results = [self._format_results(s, i) for s, i in zip(scores, indices)]
+            
+            logger.info(f"Batch query for {len(queries)} queries returned "
+                        f"{sum(len(r) for r in formatted_results)} results")
+            return formatted_results
+        
+        except Exception as e:
+            logger.error(f"Error querying vector store: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _format_results(self, scores: np.ndarray, indices: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Convert one row of a FAISS search result into result dictionaries.
+        
+        FAISS pads the row with -1 when fewer than n_results vectors exist.
+        
+        Args:
+            scores: Inner product scores of the row
+            indices: Vector indices of the row
+        
+        Returns:
+            List of dictionaries containing similar documents with metadata
+        """
+        formatted_results = []
+        for score, idx in zip(scores, indices):
+            if idx < 0:
+                continue
+            formatted_results.append({
+                'text_content': self.documents[idx],
+                'metadata': self.metadatas[idx],
+                'id': self.ids[idx],
+                'distance': 1.0 - float(score)
+            })
+        return formatted_results
+    
+    def get_collection_info(self) -> Dict[str, Any]:
+        """
+        Get information about the index.
+        
+        Returns:
+            Dictionary with index information
+        """
+        return {
+            "collection_name": "faiss_hnsw",
+            "count": self.index.ntotal if self.index is not None else 0,
+            "dimension": self.index.d if self.index is not None else 0,
+            "persist_directory": str(self.persist_directory)
+        }
+    
+    def clear_collection(self) -> bool:
+        """
+        Remove all documents from the index and from disk.
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self.index = None
+            self.ids, self.documents, self.metadatas = [], [], []
+            self._id_set = set()
+            for filename in (INDEX_FILENAME, DOCUMENTS_FILENAME):
+                (self.persist_directory / filename).unlink(missing_ok=True)
+            logger.info("Collection cleared successfully")
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing collection: {str(e)}")
+            return False
+    
+    def iter_chunks_from_file(self, chunks_file: str = "data/chunks/all_chunks.jsonl") -> Iterator[Dict[str, Any]]:
+        """
+        Stream chunks from a JSONL file one line at a time.
+        
+        Args:
+            chunks_file: Path to the JSONL file containing one chunk per line
+        
+        Yields:
+            Chunk dictionaries
+        """
+        with open(chunks_file, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+    
+    def load_chunks_from_file(self, chunks_file: str = "data/chunks/all_chunks.jsonl") -> List[Dict[str, Any]]:
+        """
+        Load chunks from a JSONL file.
+        
+        Args:
+            chunks_file: Path to the JSONL file containing one chunk per line
+        
+        Returns:
+            List of chunk dictionaries
+        """
+        try:
+            chunks = list(self.iter_chunks_from_file(chunks_file))
+            logger.info(f"Loaded {len(chunks)} chunks from {chunks_file}")
+            return chunks
+        except Exception as e:
+            logger.error(f"Error loading chunks from {chunks_file}: {str(e)}")
+            return []
+
+class PQVectorStore(FaissVectorStore):
+    """
+    Vector store using a FAISS IVF-PQ index for large collections.
+    
+    Vectors are assigned to one of nlist inverted lists and stored as pq_m
+    one-byte product-quantizer codes, e.g. 64 bytes instead of 4 KB for a
+    1024-dimensional float32 vector. Distances are computed from per-query
+    lookup tables over the codes.
+    """
+    
+    def __init__(self, persist_directory: str = "./pq_db", nlist: int = 4096, pq_m: int = 64,
+                 nbits: int = 8, nprobe: int = 32, train_size: int = 50000):
+        """
+        Initialize the vector store, loading a persisted index if present.
+        
+        Args:
+            persist_directory: Directory to persist the index and documents
+            nlist: Number of inverted lists (coarse clusters)
+            pq_m: Number of product-quantizer sub-vectors; must divide the
+                embedding dimension
+            nbits: Bits per sub-vector code
+            nprobe: Number of inverted lists visited per query
+            train_size: Number of vectors collected to train the index before
+                anything is added
+        """
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.nbits = nbits
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self._pending: List[np.ndarray] = []
+        super().__init__(persist_directory=persist_directory)
+    
+    def _create_index(self, dimension: int, nlist: Optional[int] = None) -> faiss.Index:
+        """
+        Create an empty IVF-PQ index.
+        
+        Args:
+            dimension: Embedding dimension
+            nlist: Number of inverted lists (None for self.nlist)
+        
+        Returns:
+            Empty, untrained FAISS index
+        """
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist or self.nlist, self.pq_m, self.nbits,
+                                 faiss.METRIC_INNER_PRODUCT)
+        index.nprobe = self.nprobe
+        return index
+    
+    def _add_embeddings(self, embeddings: np.ndarray):
+        """
+        Add a batch of embeddings, holding them back until the index is trained.
+        
+        Args:
+            embeddings: Float32 array of shape (n, dimension)
+        """
+        if self.index is not None and self.index.is_trained:
+            self.index.add(embeddings)
+            return
+        
+        self._pending.append(embeddings)
+        if sum(len(pending) for pending in self._pending) >= self.train_size:
+            self._flush()
+    
+    def _flush(self):
+        """Train the index on the held back embeddings, then add them."""
+        if not self._pending:
+            return
+        
+        embeddings = np.concatenate(self._pending)
+        self._pending = []
+        
+        if self.index is None:
+            # Check before creating anything, so a failed build never leaves
+            # an untrained index behind
+            min_train = 2 ** self.nbits
+            if len(embeddings) < min_train:
+                raise ValueError(f"IVF-PQ needs at least {min_train} vectors to train, got {len(embeddings)}; "
+                                 f"use FaissVectorStore for small collections")
+            
+            # k-means needs enough points per centroid (FAISS warns below 39),
+            # and about sqrt(n) lists is the usual choice for n training vectors
+            train = embeddings[:self.train_size]
+            nlist = max(1, min(self.nlist, int(np.sqrt(len(train))), len(train) // 39))
+            index = self._create_index(embeddings.shape[1], nlist)
+            
+            logger.info(f"Training IVF-PQ index (nlist={nlist}, m={self.pq_m}) on {len(train)} vectors...")
+            index.train(train)
+            if not index.is_trained:
+                raise RuntimeError(f"IVF-PQ training failed on {len(train)} vectors")
+            self.index = index
+        
+        self.index.add(embeddings)
+    
+    def _configure_search(self):
+        """Apply the search settings to an index loaded from disk."""
+        self.set_nprobe(self.nprobe)
+    
+    def set_search_ef(self, ef: int) -> bool:
+        """IVF-PQ has no HNSW graph; use set_nprobe instead."""
+        logger.warning("PQVectorStore has no search ef, use set_nprobe")
+        return False
+    
+    def set_nprobe(self, nprobe: int) -> bool:
+        """
+        Set the number of inverted lists visited by subsequent queries.
+        
+        Higher values improve recall at the cost of latency.
+        
+        Args:
+            nprobe: Number of inverted lists to visit
+        
+        Returns:
+            True if the setting was applied
+        """
+        self.nprobe = nprobe
+        if self.index is not None:
+            self.index.nprobe = nprobe
+        return True
+    
+    def get_collection_info(self) -> Dict[str, Any]:
+        """
+        Get information about the index.
+        
+        Returns:
+            Dictionary with index information
+        """
+        info = super().get_collection_info()
+        info.update({
+            "collection_name": "faiss_ivfpq",
+            "nlist": self.index.nlist if self.index is not None else self.nlist,
+            "pq_m": self.pq_m
+        })
+        return info
+    
+    def clear_collection(self) -> bool:
+        """
+        Remove all documents from the index and from disk.
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        self._pending = []
+        return super().clear_collection()
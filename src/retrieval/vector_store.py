@@ -6,30 +6,101 @@ scientific document retrieval.
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 import chromadb
+import numpy as np
 from chromadb.config import Settings
-import json
+from chromadb.segment import VectorReader
+import orjson
 from pathlib import Path
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# HNSW index settings applied when the collection is first created. Inner
+# product matches the normalized embeddings from SentenceTransformerEmbedder,
+# and the graph is denser than ChromaDB's defaults (M=16, ef=100 and 10)
+HNSW_METADATA = {
+    "hnsw:space": "ip",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64
+}
+
+# Settings ChromaDB uses for keys missing from a collection's metadata
+_CHROMA_HNSW_DEFAULTS = {
+    "hnsw:space": "l2",
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 10
+}
+
+# Number of chunk batches read ahead of the embedder in build_index
+PREFETCH_BATCHES = 4
+
+def _to_chroma_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the scalar metadata values ChromaDB accepts."""
+    return {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))}
+
+def _put(out: queue.Queue, item: Any, stop: threading.Event):
+    """Put item on a bounded queue, giving up once stop is set."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+def _read_batches(chunks: Iterator[Dict[str, Any]], batch_size: int, out: queue.Queue, stop: threading.Event):
+    """
+    Read chunks into batches and put them on a queue.
+    
+    A None item marks the end of the chunks; an exception raised while
+    reading is put on the queue instead.
+    
+    Args:
+        chunks: Iterator of chunk dictionaries
+        batch_size: Number of chunks per batch
+        out: Queue to put the batches on
+        stop: Event set by the consumer when it stops reading the queue
+    """
+    try:
+        while not stop.is_set():
+            batch = list(islice(chunks, batch_size))
+            if not batch:
+                break
+            _put(out, batch, stop)
+        _put(out, None, stop)
+    except Exception as e:
+        _put(out, e, stop)
+
 class ChromaVectorStore:
     """Vector store using ChromaDB for scientific document retrieval."""
     
-    def __init__(self, persist_directory: str = "./chroma_db", collection_name: str = "scientific_papers"):
+    def __init__(self, persist_directory: str = "./chroma_db", collection_name: str = "scientific_papers",
+                 hnsw_metadata: Optional[Dict[str, Any]] = None):
         """
         Initialize the vector store.
         
         Args:
             persist_directory: Directory to persist the ChromaDB data
             collection_name: Name of the collection to store documents
+            hnsw_metadata: HNSW index settings (e.g. "hnsw:M", "hnsw:search_ef"),
+                applied only when the collection is created. An existing collection
+                keeps the settings it was built with; a warning is logged if they
+                differ. Defaults to HNSW_METADATA.
         """
+        # PersistentClient creates the directory if needed
         self.persist_directory = Path(persist_directory)
-        self.persist_directory.mkdir(parents=True, exist_ok=True)
         self.collection_name = collection_name
+        self.hnsw_metadata = hnsw_metadata or HNSW_METADATA
+        # Embedding dimension, known once embeddings have been added or read back
+        self.dimension: Optional[int] = None
         
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -40,54 +111,155 @@ class ChromaVectorStore:
             )
         )
         
-        # Get or create collection
+        # Get or create collection. Metadata is only passed on creation: for an
+        # existing collection ChromaDB would overwrite the stored metadata while
+        # its HNSW index keeps the space it was built with
         try:
             self.collection = self.client.get_collection(name=collection_name)
-            logger.info(f"Loaded existing collection: {collection_name}")
-        except:
-            self.collection = self.client.create_collection(name=collection_name)
-            logger.info(f"Created new collection: {collection_name}")
+        except ValueError:
+            self.collection = self.client.create_collection(
+                name=collection_name,
+                metadata=self.hnsw_metadata
+            )
+        else:
+            self._check_hnsw_metadata()
+        logger.info(f"Using collection: {collection_name}")
+    
+    def _check_hnsw_metadata(self):
+        """
+        Warn if the existing collection was built with other HNSW settings than requested.
+        
+        search_ef only affects queries, so it is applied to the loaded index
+        instead of requiring a rebuild.
+        """
+        stored = self.collection.metadata or {}
+        if "hnsw:search_ef" in self.hnsw_metadata:
+            self.set_search_ef(self.hnsw_metadata["hnsw:search_ef"])
+        mismatched = {
+            key: (stored.get(key, _CHROMA_HNSW_DEFAULTS.get(key)), value)
+            for key, value in self.hnsw_metadata.items()
+            if key != "hnsw:search_ef" and stored.get(key, _CHROMA_HNSW_DEFAULTS.get(key)) != value
+        }
+        if mismatched:
+            details = ", ".join(f"{key}: {old!r} (requested {new!r})" for key, (old, new) in mismatched.items())
+            logger.warning(
+                f"Collection {self.collection_name} was built with different HNSW settings ({details}). "
+                f"Distances follow the stored settings; clear and rebuild the index to apply the new ones."
+            )
     
-    def build_index(self, chunks: List[Dict[str, Any]], embedder) -> bool:
+    def build_index(self, chunks: Iterable[Dict[str, Any]], embedder, batch_size: int = 1024) -> bool:
         """
         Build the vector index from chunks.
         
+        Chunks are embedded and added batch by batch, so a generator such as
+        iter_chunks_from_file keeps memory proportional to batch_size. Reading
+        the next batches and adding the previous batch to ChromaDB run in
+        background threads while the current batch is being embedded.
+        
         Args:
-            chunks: List of chunk dictionaries with text_content and metadata
+            chunks: Iterable of chunk dictionaries with text_content and metadata
             embedder: Embedder instance to generate embeddings
+            batch_size: Number of chunks to embed and add at a time
             
         Returns:
             True if successful, False otherwise
         """
-        if not chunks:
-            logger.warning("No chunks provided for indexing")
-            return False
-        
         try:
-            # Extract text content and metadata
-            texts = [chunk["text_content"] for chunk in chunks]
-            metadatas = [chunk["metadata"] for chunk in chunks]
-            ids = [f"chunk_{i}" for i in range(len(chunks))]
-            
-            # Generate embeddings
-            logger.info(f"Generating embeddings for {len(texts)} chunks...")
-            embeddings = embedder.embed_documents(texts)
-            
-            # Add to collection
-            self.collection.add(
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
+            batches = queue.Queue(maxsize=PREFETCH_BATCHES)
+            stop = threading.Event()
+            indexed = 0
+            
+            # One worker reads batches ahead, the other adds embedded batches
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                executor.submit(_read_batches, iter(chunks), batch_size, batches, stop)
+                pending_add = None
+                try:
+                    while True:
+                        batch = batches.get()
+                        if batch is None:
+                            break
+                        if isinstance(batch, Exception):
+                            raise batch
+                        
+                        # Extract text content and metadata
+                        texts = [chunk["text_content"] for chunk in batch]
+                        metadatas = [chunk["metadata"] for chunk in batch]
+                        ids = [metadata.get("chunk_id") or f"chunk_{indexed + i}" for i, metadata in enumerate(metadatas)]
+                        
+                        # Generate embeddings
+                        logger.info(f"Generating embeddings for {len(texts)} chunks...")
+                        embeddings = embedder.embed_documents(texts)
+                        self.dimension = embeddings.shape[1]
+                        
+                        # Add to collection, keeping at most one add in flight
+                        if pending_add is not None:
+                            pending_add.result()
+                        pending_add = executor.submit(self.upsert, ids, embeddings, texts, metadatas)
+                        indexed += len(batch)
+                    
+                    if pending_add is not None:
+                        pending_add.result()
+                finally:
+                    stop.set()
             
-            logger.info(f"Successfully indexed {len(chunks)} chunks")
+            if indexed == 0:
+                logger.warning("No chunks provided for indexing")
+                return False
+            
+            logger.info(f"Successfully indexed {indexed} chunks")
             return True
             
         except Exception as e:
             logger.error(f"Error building index: {str(e)}")
             return False
     
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str],
+               metadatas: List[Dict[str, Any]]):
+        """
+        Insert or update documents in the collection.
+        
+        Upserting by chunk ID means re-indexing a chunk replaces it instead
+        of adding a duplicate. Non-scalar metadata values are dropped, since
+        ChromaDB only stores strings, numbers and booleans.
+        
+        Args:
+            ids: Document IDs, normally the chunk IDs
+            embeddings: Document embeddings, one row per document
+            documents: Document texts
+            metadatas: Document metadata dictionaries
+        """
+        # ChromaDB 0.4 only accepts lists
+        self.collection.upsert(
+            ids=ids,
+            embeddings=embeddings.tolist(),
+            documents=documents,
+            metadatas=[_to_chroma_metadata(metadata) for metadata in metadatas]
+        )
+    
+    def set_search_ef(self, ef: int) -> bool:
+        """
+        Set the HNSW search beam width (ef) used by subsequent queries.
+        
+        Higher values visit more graph nodes, trading latency for recall.
+        ChromaDB 0.4.x only reads hnsw:search_ef when the collection is
+        created, so this updates the loaded index segment directly.
+        
+        Args:
+            ef: Search beam width
+            
+        Returns:
+            True if the setting was applied, False otherwise
+        """
+        try:
+            segment = self.client._server._manager.get_segment(self.collection.id, VectorReader)
+            segment._params.search_ef = ef
+            if segment._index is not None:
+                segment._index.set_ef(ef)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not set search ef: {str(e)}")
+            return False
+    
     def query(self, query_text: str, n_results: int = 5, embedder=None) -> List[Dict[str, Any]]:
         """
         Query the vector store for similar documents.
@@ -103,9 +275,9 @@ class ChromaVectorStore:
         try:
             if embedder:
                 # Use custom embedder for query
-                query_embedding = embedder.embed_documents([query_text])
+                query_embedding = embedder.embed_query(query_text)
                 results = self.collection.query(
-                    query_embeddings=query_embedding,
+                    query_embeddings=[query_embedding.tolist()],
                     n_results=n_results
                 )
             else:
@@ -115,17 +287,7 @@ class ChromaVectorStore:
                     n_results=n_results
                 )
             
-            # Format results
-            formatted_results = []
-            if results['documents'] and results['documents'][0]:
-                for i in range(len(results['documents'][0])):
-                    result = {
-                        'text_content': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'id': results['ids'][0][i],
-                        'distance': results['distances'][0][i] if 'distances' in results else None
-                    }
-                    formatted_results.append(result)
+            formatted_results = self._format_results(results, 0)
             
             logger.info(f"Query returned {len(formatted_results)} results")
             return formatted_results
@@ -134,10 +296,78 @@ class ChromaVectorStore:
             logger.error(f"Error querying vector store: {str(e)}")
             return []
     
-    def get_collection_info(self) -> Dict[str, Any]:
+    def query_batch(self, queries: List[str], n_results: int = 5, embedder=None) -> List[List[Dict[str, Any]]]:
+        """
+        Query the vector store for several queries at once.
+        
+        All queries are embedded in one encoder call and searched in one
+        ChromaDB query, instead of one of each per query.
+        
+        Args:
+            queries: Query texts to search for
+            n_results: Number of results to return per query
+            embedder: Embedder instance to generate query embeddings (optional)
+            
+        Returns:
+            One list of result dictionaries per query, in the order of queries
+        """
+        if not queries:
+            return []
+        
+        try:
+            if embedder:
+                query_embeddings = embedder.embed_documents(queries, show_progress_bar=False)
+                results = self.collection.query(
+                    query_embeddings=query_embeddings.tolist(),
+                    n_results=n_results
+                )
+            else:
+                results = self.collection.query(
+                    query_texts=queries,
+                    n_results=n_results
+                )
+            
+            formatted_results = [self._format_results(results, row) for row in range(len(queries))]
+            
+            logger.info(f"Batch query for {len(queries)} queries returned "
+                        f"{sum(len(r) for r in formatted_results)} results")
+            return formatted_results
+            
+        except Exception as e:
+            logger.error(f"Error querying vector store: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _format_results(self, results: Dict[str, Any], row: int) -> List[Dict[str, Any]]:
+        """
+        Convert one row of a ChromaDB query response into result dictionaries.
+        
+        Args:
+            results: Response of collection.query
+            row: Index of the query within the response
+            
+        Returns:
+            List of dictionaries containing similar documents with metadata
+        """
+        if not results['documents'] or not results['documents'][row]:
+            return []
+        
+        documents = results['documents'][row]
+        distances = results['distances'][row] if results.get('distances') else [None] * len(documents)
+        return [
+            {'text_content': document, 'metadata': metadata, 'id': doc_id, 'distance': distance}
+            for document, metadata, doc_id, distance in zip(
+                documents, results['metadatas'][row], results['ids'][row], distances
+            )
+        ]
+    
+    def get_collection_info(self, embedder=None) -> Dict[str, Any]:
         """
         Get information about the collection.
         
+        Args:
+            embedder: Embedder whose dimension is reported while the
+                collection is still empty (optional)
+            
         Returns:
             Dictionary with collection information
         """
@@ -146,41 +376,83 @@ class ChromaVectorStore:
             return {
                 "collection_name": self.collection_name,
                 "count": count,
-                "dimension": 1024,  # BGE-large-en-v1.5 dimension
+                "dimension": self._get_dimension(count, embedder),
                 "persist_directory": str(self.persist_directory)
             }
         except Exception as e:
             logger.error(f"Error getting collection info: {str(e)}")
             return {"count": 0, "dimension": 0}
     
+    def _get_dimension(self, count: int, embedder=None) -> int:
+        """
+        Get the embedding dimension of the collection.
+        
+        Args:
+            count: Number of documents in the collection
+            embedder: Embedder to fall back to for an empty collection (optional)
+            
+        Returns:
+            Embedding dimension, or 0 if it is not known yet
+        """
+        if self.dimension is None and count > 0:
+            # Read it back from a stored embedding, e.g. after a restart or bulk_index
+            stored = self.collection.get(limit=1, include=["embeddings"])["embeddings"]
+            if stored:
+                self.dimension = len(stored[0])
+        if self.dimension is not None:
+            return self.dimension
+        if embedder is not None:
+            return embedder.model.get_sentence_embedding_dimension()
+        return 0
+    
     def clear_collection(self) -> bool:
         """
         Clear all documents from the collection.
         
+        The collection is dropped and recreated with the requested HNSW
+        settings, which removes its rows and index files without matching
+        every document.
+        
         Returns:
             True if successful, False otherwise
         """
         try:
-            self.collection.delete(where={})
+            self.client.delete_collection(self.collection_name)
+            self.collection = self.client.create_collection(name=self.collection_name, metadata=self.hnsw_metadata)
+            self.dimension = None
             logger.info("Collection cleared successfully")
             return True
         except Exception as e:
             logger.error(f"Error clearing collection: {str(e)}")
             return False
     
-    def load_chunks_from_file(self, chunks_file: str = "data/chunks/all_chunks.json") -> List[Dict[str, Any]]:
+    def iter_chunks_from_file(self, chunks_file: str = "data/chunks/all_chunks.jsonl") -> Iterator[Dict[str, Any]]:
+        """
+        Stream chunks from a JSONL file one line at a time.
+        
+        Args:
+            chunks_file: Path to the JSONL file containing one chunk per line
+            
+        Yields:
+            Chunk dictionaries
+        """
+        with open(chunks_file, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+    
+    def load_chunks_from_file(self, chunks_file: str = "data/chunks/all_chunks.jsonl") -> List[Dict[str, Any]]:
         """
-        Load chunks from a JSON file.
+        Load chunks from a JSONL file.
         
         Args:
-            chunks_file: Path to the JSON file containing chunks
+            chunks_file: Path to the JSONL file containing one chunk per line
             
         Returns:
             List of chunk dictionaries
         """
         try:
-            with open(chunks_file, 'r', encoding='utf-8') as f:
-                chunks = json.load(f)
+            chunks = list(self.iter_chunks_from_file(chunks_file))
             logger.info(f"Loaded {len(chunks)} chunks from {chunks_file}")
             return chunks
         except Exception as e:
@@ -189,10 +461,10 @@ class ChromaVectorStore:
 
 def main():
     """Test the vector store functionality."""
-    from src.retrieval.embedder import SentenceTransformerEmbedder
+    from src.retrieval.embedder import get_embedder
     
     # Initialize embedder and vector store
-    embedder = SentenceTransformerEmbedder()
+    embedder = get_embedder()
     vector_store = ChromaVectorStore()
     
     # Sample chunks for testing
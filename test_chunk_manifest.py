@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental chunking with the chunk manifest
+
+Run with: python -m pytest test_chunk_manifest.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import orjson
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from data_processing.chunker import ScientificChunker
+
+PAPER = {
+    "paper_id": "paper",
+    "title": "A study of neural codes",
+    "authors": [],
+    "abstract": "Abstract: We study neural codes.",
+    "sections": [
+        {"header": "1. Introduction", "content": [
+            {"type": "NarrativeText", "text": "Neurons encode stimuli."},
+            {"type": "NarrativeText", "text": "Codes can be sparse or dense."}
+        ]}
+    ],
+    "equations": [],
+    "tables": []
+}
+
+def _output_lines(chunker: ScientificChunker) -> int:
+    return len((chunker.output_dir / "all_chunks.jsonl").read_bytes().splitlines())
+
+def test_rerun_yields_no_new_chunks(tmp_path):
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    (json_dir / "paper.json").write_bytes(orjson.dumps(PAPER))
+    chunker = ScientificChunker(output_dir=str(tmp_path / "out"), max_workers=1)
+
+    chunks = list(chunker.chunk_all_papers(str(json_dir)))
+    assert len(chunks) == 4
+    assert _output_lines(chunker) == 4
+    assert chunker.get_output_totals() == {"total_chunks": 4, "unique_papers": 1}
+
+    assert list(chunker.chunk_all_papers(str(json_dir))) == []
+    assert _output_lines(chunker) == 4
+    assert chunker.get_output_totals() == {"total_chunks": 4, "unique_papers": 1}
+
+def test_changed_paper_reports_only_removed_chunks_as_stale(tmp_path):
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    paper_file = json_dir / "paper.json"
+    paper_file.write_bytes(orjson.dumps(PAPER))
+    chunker = ScientificChunker(output_dir=str(tmp_path / "out"), max_workers=1)
+    list(chunker.chunk_all_papers(str(json_dir)))
+
+    # Drop the second paragraph and make sure the change is visible in the mtime
+    changed = dict(PAPER, sections=[dict(PAPER["sections"][0], content=PAPER["sections"][0]["content"][:1])])
+    paper_file.write_bytes(orjson.dumps(changed))
+    mtime = paper_file.stat().st_mtime + 1
+    os.utime(paper_file, (mtime, mtime))
+
+    assert len(list(chunker.chunk_all_papers(str(json_dir)))) == 3
+    assert _output_lines(chunker) == 3
+    assert chunker.pop_stale_chunk_ids() == ["paper_0_1"]
+    assert chunker.pop_stale_chunk_ids() == []
@@ -17,10 +17,11 @@ def main():
     # Initialize chunker
     chunker = ScientificChunker()
     
-    # Chunk all papers
-    chunks = chunker.chunk_all_papers()
+    # Chunk all new or changed papers
+    chunks = list(chunker.chunk_all_papers())
+    totals = chunker.get_output_totals()
     
-    print(f"Successfully created {len(chunks)} chunks")
+    print(f"Successfully created {len(chunks)} new chunks ({totals['total_chunks']} in total)")
     print(f"Chunks saved to: {chunker.output_dir}")
     
     # Show some sample chunks
@@ -28,8 +29,8 @@ def main():
         print("\nSample chunks:")
         for i, chunk in enumerate(chunks[:3]):
             print(f"Chunk {i+1}:")
-            print(f"  Content: {chunk['text_content'][:100]}...")
-            print(f"  Metadata: {chunk['metadata']}")
+            print(f"  Content: {chunk.text_content[:100]}...")
+            print(f"  Metadata: {chunk.metadata}")
             print()
 
 if __name__ == "__main__":
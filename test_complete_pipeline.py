@@ -8,14 +8,13 @@ to answer generation.
 
 import sys
 from pathlib import Path
-import json
 import time
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from retrieval.vector_store import ChromaVectorStore
-from retrieval.embedder import SentenceTransformerEmbedder
+from retrieval.embedder import get_embedder
 from generation.llm import RAGGenerator
 
 def test_complete_pipeline():
@@ -26,7 +25,7 @@ def test_complete_pipeline():
     # Step 1: Load components
     print("\n1️⃣ Loading Components...")
     try:
-        embedder = SentenceTransformerEmbedder()
+        embedder = get_embedder()
         print("   ✅ Embedder loaded successfully")
         
         vector_store = ChromaVectorStore()
@@ -50,16 +49,11 @@ def test_complete_pipeline():
             print("   ⚠️  No documents found. Loading chunks...")
             
             # Load chunks from file
-            chunks_file = Path("data/chunks/all_chunks.json")
+            chunks_file = Path("data/chunks/all_chunks.jsonl")
             if chunks_file.exists():
-                with open(chunks_file, 'r', encoding='utf-8') as f:
-                    chunks = json.load(f)
-                
-                print(f"   📄 Loaded {len(chunks)} chunks from file")
-                
-                # Build index
+                # Build index, streaming chunks from the file in batches
                 print("   🔨 Building vector index...")
-                success = vector_store.build_index(chunks, embedder)
+                success = vector_store.build_index(vector_store.iter_chunks_from_file(str(chunks_file)), embedder)
                 
                 if success:
                     print("   ✅ Vector index built successfully")
@@ -86,9 +80,11 @@ def test_complete_pipeline():
         "activation functions"
     ]
     
-    for query in test_queries:
-        try:
-            results = vector_store.query(query, n_results=2, embedder=embedder)
+    try:
+        # Embed and search all queries at once
+        batch_results = vector_store.query_batch(test_queries, n_results=2, embedder=embedder)
+        
+        for query, results in zip(test_queries, batch_results):
             print(f"   🔍 Query: '{query}' -> {len(results)} results")
             
             if results:
@@ -98,8 +94,8 @@ def test_complete_pipeline():
             else:
                 print(f"      ⚠️  No results for '{query}'")
                 
-        except Exception as e:
-            print(f"   ❌ Error testing query '{query}': {e}")
+    except Exception as e:
+        print(f"   ❌ Error testing queries: {e}")
     
     # Step 4: Test generation
     print("\n4️⃣ Testing Generation...")
@@ -12,7 +12,7 @@ import os
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from retrieval.vector_store import ChromaVectorStore
-from retrieval.embedder import SentenceTransformerEmbedder
+from retrieval.embedder import get_embedder
 from generation.llm import RAGGenerator
 
 def main():
@@ -25,7 +25,7 @@ def main():
     
     # Initialize components
     print("Initializing components...")
-    embedder = SentenceTransformerEmbedder()
+    embedder = get_embedder()
     vector_store = ChromaVectorStore()
     
     # Initialize RAG generator
@@ -43,15 +43,15 @@ def main():
     print("TESTING RAG GENERATION")
     print("="*60)
     
-    for i, query in enumerate(test_queries, 1):
+    # Retrieve relevant context for all queries at once
+    print("Retrieving relevant context...")
+    all_context_chunks = vector_store.query_batch(test_queries, n_results=3, embedder=embedder)
+    
+    for i, (query, context_chunks) in enumerate(zip(test_queries, all_context_chunks), 1):
         print(f"\n--- Test Query {i} ---")
         print(f"Query: {query}")
         
         try:
-            # Retrieve relevant context
-            print("Retrieving relevant context...")
-            context_chunks = vector_store.query(query, n_results=3, embedder=embedder)
-            
             if not context_chunks:
                 print("No relevant context found.")
                 continue
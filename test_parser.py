@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Tests for the abstract and section header patterns of the PDF parser
+
+Run with: python -m pytest test_parser.py
+"""
+
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from data_processing.parser import _is_abstract, _is_section_header
+
+def test_abstract_headings_match():
+    for text in ["Abstract", "ABSTRACT", "abstract:", "Abstract: We study", "ABSTRACT\nWe study",
+                 "Abstract We study", "ABSTRACT  The brain"]:
+        assert _is_abstract(text), text
+
+def test_words_starting_with_abstract_do_not_match():
+    for text in ["ABSTRACTION LAYERS", "Abstraction of neural codes", "ABSTRACTS OF TALKS",
+                 "Abstracts of the meeting", "abstracted: features", "abstract reasoning is hard"]:
+        assert not _is_abstract(text), text
+
+def test_section_headers_match():
+    for text in ["1. Introduction", "METHODS", "Results", "discussion ", "References"]:
+        assert _is_section_header(text), text
+
+def test_body_text_is_not_a_section_header():
+    for text in ["The results show that neurons fire.", "introduction of a new method"]:
+        assert not _is_section_header(text), text
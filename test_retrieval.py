@@ -5,39 +5,39 @@ Test script to build vector index and test retrieval engine
 
 import sys
 from pathlib import Path
-import json
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from retrieval.vector_store import ChromaVectorStore
-from retrieval.embedder import SentenceTransformerEmbedder
+from retrieval.embedder import get_embedder
+from data_processing.chunker import ScientificChunker
 
 def main():
     print("Starting retrieval engine setup...")
     
-    # Load chunks
-    chunks_file = Path("data/chunks/all_chunks.json")
+    # Check for chunks
+    chunks_file = Path("data/chunks/all_chunks.jsonl")
     if not chunks_file.exists():
         print("Error: Chunks file not found!")
         return
     
-    with open(chunks_file, 'r', encoding='utf-8') as f:
-        chunks = json.load(f)
-    
-    print(f"Loaded {len(chunks)} chunks")
-    
     # Initialize embedder
     print("Initializing embedder...")
-    embedder = SentenceTransformerEmbedder()
+    embedder = get_embedder()
     
     # Initialize vector store
     print("Initializing vector store...")
     vector_store = ChromaVectorStore()
     
-    # Build index
+    # Build index, streaming chunks from the file in batches
     print("Building vector index...")
-    vector_store.build_index(chunks, embedder)
+    vector_store.build_index(vector_store.iter_chunks_from_file(str(chunks_file)), embedder)
+    
+    # Remove chunks of changed or removed papers dropped by the chunker
+    stale_ids = ScientificChunker(output_dir=str(chunks_file.parent)).pop_stale_chunk_ids()
+    if stale_ids:
+        vector_store.collection.delete(ids=stale_ids)
     
     # Test query
     print("\nTesting retrieval with sample query...")